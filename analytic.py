@@ -0,0 +1,220 @@
+import itertools
+import math
+import time as clock
+from concurrent.futures import ProcessPoolExecutor
+
+import pallet_track
+import replications
+import scheduler
+import sweep
+
+# The line as a closed network: every pallet position is a slot that holds one pallet, taken from the
+# moment a pallet is released towards it until the clearing time after it leaves it. The takt is then
+# bounded by
+#  - the pallets: each pallet has to travel and be processed around the whole line,
+#  - the blocking: the empty slots travel upstream, one position per clearing time,
+#  - each slot: it cannot take a new pallet faster than its transit, processing and clearing times,
+#  - each robot station: its robots cannot place faster than their feeders or shuttles supply parts,
+#  - each shuttle pair whose second position starts without a pallet: its shuttle then parks at the second
+#    robot, and the first robot only gets its next part once the second one has served the same pallet.
+#    The pair stays serialized like that for the whole run, while a pair started with both pallets
+#    pipelines.
+# The robot stations' supply is queueing-corrected: feeders shuffle a random number of times and wait for
+# the vision controller they share (an M/D/1 wait). Everything is read from the same parameters and
+# layout files as pallet_track, so any sweep parameter can be screened in microseconds per point.
+# Pallet and feeder variability beyond that is not modelled, so the estimate tends to be optimistic
+# where several bounds are close (see check).
+
+# design points screened, as sweep parameters (see sweep.py)
+screen_levels = {'pallet_track.pallet_count': list(range(4, 21)),
+                 'station2_3.pick_prob': [0.2, 0.3, 0.45],
+                 'station14.pick_prob': [0.2, 0.3, 0.45]}
+# number of screened points with the shortest estimated takt run through the full simulation
+shortlist = 5
+# seed of the simulation runs the estimates are checked against
+seed = 1
+# worker processes for the simulation runs (None: one per core)
+workers = None
+
+
+# seconds an action of the given duration takes on the clock (it completes on the first tick after it,
+# as scheduler.first_tick_after rounds it for pallet_track.time_inc)
+def action_time(duration):
+    step = scheduler.units(pallet_track.time_inc)
+    return max(scheduler.units(duration) // step + 1, 0) * pallet_track.time_inc
+
+
+# expected shuffle/inspect cycles until a freshly fed tray shows a pick-able part
+def expected_shuffles(module):
+    quantities = range(module.feed_in_qty_min, module.feed_in_qty_max + 1)
+    cycles = 0.0
+    for quantity in quantities:
+        success = 1 - (1 - module.pick_prob) ** quantity
+        cycles += 1 / success if success > 0 else math.inf
+    return cycles / len(quantities)
+
+
+# seconds per part each robot of a vision station can sustain
+def vision_station_period(module, robot_count):
+    prog = module.robot_prog_times
+    pick = action_time(prog['pick left feeder'])
+    place = action_time(prog['place at pallet'])
+    inspect = action_time(module.inspect_duration)
+    shuffles = expected_shuffles(module)
+    # a picked tray is inspected empty, fed in, then shuffled and inspected until a part shows
+    inspections = 1 + shuffles
+    # the vision controller inspects for every feeder of the station
+    vision = robot_count * inspections * inspect
+    period = pick + place
+    for _ in range(1000):
+        load = min(vision / period, 0.99)
+        wait = load * inspect / (2 * (1 - load))
+        tray = (pick + inspect + action_time(module.feed_in_duration) +
+                shuffles * (action_time(module.shuffle_duration) + inspect) + inspections * wait)
+        # the robot alternates between its two feeders' trays
+        updated = (period + max(pick + place, tray / 2, vision)) / 2
+        if abs(updated - period) < 1e-9:
+            break
+        period = updated
+    return period
+
+
+# (place time, seconds per part) of each controller of the known station modules
+def robot_times():
+    times = {}
+    for module, names in pallet_track.vision_stations:
+        place = action_time(module.robot_prog_times['place at pallet'])
+        period = vision_station_period(module, len(names))
+        for name in names:
+            times[name] = (place, period)
+    for module, names in pallet_track.shuttle_stations:
+        prog = module.robot_prog_times
+        cycle = action_time(prog['pick']) + action_time(prog['inspect']) + action_time(prog['place'])
+        # the shuttle brings each robot of the pair one part per round trip
+        round_trip = 2 * action_time(module.shuttle_duration + prog['pick'])
+        for name in names:
+            times[name] = (action_time(prog['place']), max(cycle, round_trip))
+    return times
+
+
+# seconds per pallet of a serialized shuttle pair: the first robot places, the pallet moves on, the second
+# robot places and the shuttle brings the first one its next part to pick and inspect
+def serialized_pair_period(module, transit):
+    prog = module.robot_prog_times
+    return (2 * action_time(prog['place']) + action_time(transit) +
+            action_time(module.shuttle_duration + prog['pick']) +
+            action_time(prog['pick']) + action_time(prog['inspect']))
+
+
+# visits of each position per pallet passing the takt position, diverts splitting evenly
+def visit_ratios(line):
+    count = len(line.successor) - 1
+    downstream = [None] + [line.routes[pos] or (line.successor[pos],) for pos in range(1, count + 1)]
+    visits = [0.0] + [1.0] * count
+    for _ in range(10000):
+        flow = [0.0] * (count + 1)
+        for pos in range(1, count + 1):
+            for target in downstream[pos]:
+                flow[target] += visits[pos] / len(downstream[pos])
+        # damped so the iteration also settles on periodic layouts
+        updated = [(visit + inflow) / 2 for visit, inflow in zip(visits, flow)]
+        scale = updated[line.takt_position]
+        updated = [visit / scale for visit in updated]
+        if max(abs(a - b) for a, b in zip(updated, visits)) < 1e-12:
+            return updated
+        visits = updated
+    return visits
+
+
+# estimated takt (seconds between completions at the takt position) and throughput of the current
+# parameters or line_file, with the bound that sets them ('pallets', 'blocking', a station id or a robot)
+def estimate():
+    line = pallet_track.load_line()
+    count = len(line.successor) - 1
+    visits = visit_ratios(line)
+    robots = robot_times()
+    clearing = action_time(pallet_track.pallet_clearing_time)
+    # seconds per pallet needed by each bound, the largest one sets the takt
+    periods = {}
+    travel = 0.0
+    for pos in range(1, count + 1):
+        process = action_time(line.cycle_time[pos])
+        for name, bound_pos in line.bindings.items():
+            if bound_pos == pos and name in robots:
+                place, period = robots[name]
+                process = max(process, place)
+                periods[name] = max(periods.get(name, 0.0), visits[pos] * period)
+        transit = action_time(line.transit_time[pos])
+        travel += visits[pos] * (transit + process)
+        periods[line.station_id[pos]] = visits[pos] * (transit + process + clearing)
+    for module, (first, second) in pallet_track.shuttle_stations:
+        first_pos, second_pos = line.bindings.get(first), line.bindings.get(second)
+        if first_pos and second_pos and second_pos > pallet_track.pallet_count:
+            periods[first] = max(periods.get(first, 0.0),
+                                 visits[first_pos] * serialized_pair_period(module, line.transit_time[second_pos]))
+    periods['pallets'] = travel / pallet_track.pallet_count if pallet_track.pallet_count else math.inf
+    holes = count - pallet_track.pallet_count
+    periods['blocking'] = sum(visits[1:]) * clearing / holes if holes > 0 else math.inf
+    limit = max(periods, key=periods.get)
+    takt = periods[limit]
+    return {'takt': takt,
+            'throughput': 1 / takt * 3600,
+            'limit': limit}
+
+
+# estimate every design point, returns one row per point
+def screen(design_points):
+    rows = []
+    for point in design_points:
+        saved = sweep.apply_parameters(point)
+        try:
+            row = {name: sweep.parameter_value(name) for name in point}
+            row.update(estimate())
+        finally:
+            sweep.restore_parameters(saved)
+        rows.append(row)
+    return rows
+
+
+# simulated takt of one design point next to its estimate
+def check_point(point, run_seed=seed):
+    simulated = sweep.run_point(point, run_seed)['Overall mean']
+    estimated = screen([point])[0]
+    return {'point': point,
+            'estimated': estimated['takt'],
+            'limit': estimated['limit'],
+            'simulated': simulated,
+            'error': estimated['takt'] / simulated - 1}
+
+
+# run the design points through the full simulation across a process pool, next to their estimates
+def check(design_points, run_seed=seed, max_workers=workers):
+    with ProcessPoolExecutor(max_workers=max_workers, initializer=replications.quiet_worker) as pool:
+        return list(pool.map(check_point, design_points, itertools.repeat(run_seed)))
+
+
+def print_check(checks):
+    print('')
+    for result in checks:
+        print(', '.join(name + '=' + sweep.format_value(value) for name, value in result['point'].items()) +
+              ' -> takt estimated ' + str(round(result['estimated'], 3)) + ' (' + result['limit'] + ')' +
+              ' / simulated ' + str(round(result['simulated'], 3)) +
+              '  (error ' + '{0:+.1f}%'.format(result['error'] * 100) + ')')
+    errors = [abs(result['error']) for result in checks]
+    print('')
+    print('Mean / max absolute error: ' + '{0:.1f}% / {1:.1f}%'.format(
+        sum(errors) / len(errors) * 100, max(errors) * 100))
+
+
+if __name__ == '__main__':
+    design_points = sweep.grid_design(screen_levels)
+    print('Screening', len(design_points), 'design points...')
+    start = clock.perf_counter()
+    rows = screen(design_points)
+    wall = clock.perf_counter() - start
+    print('Estimated in ' + str(round(wall * 1000)) + ' ms (' + str(round(wall / len(rows) * 1e6)) + ' us per point)')
+    ranked = sorted(range(len(rows)), key=lambda i: rows[i]['takt'])
+    print('Simulating the', shortlist, 'points with the shortest estimated takt...')
+    print_check(check([design_points[i] for i in ranked[:shortlist]]))
+    print('')
+    print('Screening Complete!')
@@ -0,0 +1,73 @@
+import pallet_track
+import replications
+import result_cache
+import sweep
+
+# A configuration is a dict of sweep parameters (see sweep.py), e.g.
+#   {'pallet_track.pallet_count': 18, 'station2_3.pick_prob': 0.4}
+# applied for the duration of a call only, so any number of configurations can be simulated from one
+# process without touching the module parameters. Importing this module runs nothing and leaves NumPy
+# unloaded until a run draws its first random number (or a lock-step run needs it).
+
+
+# the statistics of one run of a configuration
+class RunResult(object):
+    def __init__(self, config, seed, runtime, outputs):
+        self.config = config
+        self.seed = seed
+        self.runtime = runtime
+        # cycle time statistics (stats.StreamingStats) by robot name, and 'Overall' for the takt
+        self.outputs = outputs
+
+    # mean seconds between pallets completing at the takt position (nan if none completed)
+    @property
+    def takt(self):
+        return self.outputs['Overall'].mean
+
+    # pallets per hour (nan if no pallet completed, like the takt)
+    @property
+    def throughput(self):
+        return 3600 / self.takt
+
+    # (mean, max) per output, as replications.run_replication reduces a run
+    def summary(self):
+        return {name: (cycle_times.mean, cycle_times.max) for name, cycle_times in self.outputs.items()}
+
+
+# apply a configuration and runtime (in hours, None: keep pallet_track.runtime), returns what
+# sweep.restore_parameters needs to undo it
+def apply(config, runtime):
+    saved = sweep.apply_parameters(config)
+    if runtime is not None:
+        saved.append((pallet_track, 'runtime', pallet_track.runtime))
+        pallet_track.runtime = runtime
+    return saved
+
+
+# run one configuration for runtime hours (None: pallet_track.runtime) from the given seed
+# (None: seed from system entropy), read from the result cache when it holds the same run
+def simulate(config=None, seed=1, runtime=None, antithetic=False, cache=True):
+    config = dict(config or {})
+    saved = apply(config, runtime)
+    try:
+        run_hours = pallet_track.runtime
+        if cache:
+            outputs = result_cache.run_simulation(seed, antithetic)
+        else:
+            outputs = pallet_track.run_simulation(seed, antithetic)
+    finally:
+        sweep.restore_parameters(saved)
+    return RunResult(config, seed, run_hours, outputs)
+
+
+# count replications of one configuration advanced in lock-step with NumPy, summarized per output
+def simulate_lockstep(config=None, count=None, seed=1, runtime=None):
+    import vector_engine
+
+    config = dict(config or {})
+    saved = apply(config, runtime)
+    try:
+        outputs = vector_engine.run_simulation(count or vector_engine.replications_count, seed)
+    finally:
+        sweep.restore_parameters(saved)
+    return {name: replications.summarize(samples) for name, samples in outputs.items()}
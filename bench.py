@@ -0,0 +1,177 @@
+import json
+import os
+import random
+import sys
+import time as clock
+import tracemalloc
+
+import event_log
+import pallet_track
+import prob_sample
+import scheduler
+import station2_3
+import station8_9
+import station10_11
+import station14
+import streams
+
+# seed of every benchmark
+seed = 1
+# simulated horizon (in seconds) of the end-to-end line benchmarks and of each station on its own
+line_horizon = 900
+station_horizon = 1800
+# prob_sample runs per benchmark by sampler
+prob_sample_runs = {'python': 200, 'vectorized': 20000}
+# timing repeats, the fastest one counts
+repeats = 3
+# where to write the results (None: print only)
+output_file = 'bench_results.json'
+# results to compare against (benchmarks it does not hold yet are added from this run)
+baseline_file = 'bench_baseline.json'
+# overwrite the baseline of the benchmarks run with this run's results
+update_baseline = False
+# fail if throughput drops by more than this fraction, or peak memory grows by more than memory_threshold
+threshold = 0.2
+memory_threshold = 0.5
+
+
+# a pallet stop that always holds a pallet, the next one arriving as soon as a robot completes
+class BenchStop(object):
+    def __init__(self):
+        self.current_pallet = 1
+        self.process_complete = False
+
+
+# the whole line for line_horizon simulated seconds with the given engine, returns simulated seconds
+def line(engine):
+    saved = pallet_track.engine, pallet_track.runtime
+    pallet_track.engine, pallet_track.runtime = engine, line_horizon / 3600
+    try:
+        pallet_track.run_simulation(seed)
+    finally:
+        pallet_track.engine, pallet_track.runtime = saved
+    return line_horizon
+
+
+# one station module's controllers on always-occupied stops for station_horizon, returns simulated seconds
+def station(module):
+    streams.reset(seed)
+    scheduler.reset(pallet_track.time_inc, False)
+    controllers = list(module.initialize().values())
+    stops = [BenchStop() for _ in controllers]
+    for tick in range(scheduler.first_tick_after(scheduler.units(station_horizon))):
+        time = tick * scheduler.step
+        for controller in controllers:
+            controller.status_check(time)
+        for controller, stop in zip(controllers, stops):
+            controller.decision_tree(time, stop)
+            if controller.robot.process_complete:
+                controller.robot.process_complete = False
+    return station_horizon
+
+
+# prob_sample with the given sampler, returns the number of shuffles sampled
+def sampler(mode):
+    run_count = prob_sample_runs[mode]
+    if mode == 'vectorized':
+        prob_sample.sample_runs_vectorized(run_count=run_count, seed=seed)
+    else:
+        random.seed(seed)
+        prob_sample.sample_runs(run_count=run_count)
+    return run_count * prob_sample.sample_size
+
+
+# name: (function, argument, throughput unit)
+benchmarks = {'line tick engine': (line, 'tick', 'sim-s/wall-s'),
+              'line event engine': (line, 'event', 'sim-s/wall-s'),
+              'station2_3': (station, station2_3, 'sim-s/wall-s'),
+              'station8_9': (station, station8_9, 'sim-s/wall-s'),
+              'station10_11': (station, station10_11, 'sim-s/wall-s'),
+              'station14': (station, station14, 'sim-s/wall-s'),
+              'prob_sample python': (sampler, 'python', 'shuffles/wall-s'),
+              'prob_sample vectorized': (sampler, 'vectorized', 'shuffles/wall-s')}
+
+
+# time a benchmark (fastest of repeats) and measure its peak traced memory in a separate run
+def run_benchmark(name):
+    function, argument, unit = benchmarks[name]
+    best = None
+    for _ in range(repeats):
+        start = clock.perf_counter()
+        work = function(argument)
+        wall = clock.perf_counter() - start
+        best = wall if best is None else min(best, wall)
+    tracemalloc.start()
+    function(argument)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return {'unit': unit,
+            'throughput': work / best,
+            'wall_seconds': best,
+            'peak_memory_kb': peak / 1024}
+
+
+def run_benchmarks(names=None):
+    event_log.enabled = False
+    return {name: run_benchmark(name) for name in (names or benchmarks)}
+
+
+# regressions against the baseline as (name, message) pairs (benchmarks without a baseline have none)
+def compare(results, baseline):
+    regressions = []
+    for name, result in results.items():
+        if name not in baseline:
+            continue
+        reference = baseline[name]
+        if result['throughput'] < reference['throughput'] * (1 - threshold):
+            regressions.append((name, 'throughput ' + str(round(result['throughput'], 1)) + ' vs baseline ' +
+                                str(round(reference['throughput'], 1)) + ' ' + result['unit']))
+        if result['peak_memory_kb'] > reference['peak_memory_kb'] * (1 + memory_threshold):
+            regressions.append((name, 'peak memory ' + str(round(result['peak_memory_kb'])) + ' kB vs baseline ' +
+                                str(round(reference['peak_memory_kb'])) + ' kB'))
+    return regressions
+
+
+def print_results(results, baseline):
+    print('')
+    print('{0:<26}{1:>14}{2:>16}{3:>10}{4:>12}'.format('benchmark', 'throughput', 'unit', 'vs base', 'peak kB'))
+    for name, result in results.items():
+        if name in baseline:
+            change = '{0:+.1f}%'.format((result['throughput'] / baseline[name]['throughput'] - 1) * 100)
+        else:
+            change = 'no base'
+        print('{0:<26}{1:>14.1f}{2:>16}{3:>10}{4:>12.0f}'.format(
+            name, result['throughput'], result['unit'], change, result['peak_memory_kb']))
+
+
+# run the benchmarks, print them against the baseline and write the results, returns the regressions
+def main(names=None):
+    print('Running Benchmarks...')
+    results = run_benchmarks(names)
+    stored = {}
+    if baseline_file and os.path.exists(baseline_file):
+        with open(baseline_file) as baseline_in:
+            stored = json.load(baseline_in)
+    baseline = {} if update_baseline else stored
+    print_results(results, baseline)
+    if output_file:
+        with open(output_file, 'w') as results_out:
+            json.dump(results, results_out, indent=2)
+    # benchmarks without a baseline (e.g. left out of an earlier --only run) get this run's results as theirs
+    added = [name for name in results if name not in baseline]
+    if baseline_file and added:
+        stored.update((name, results[name]) for name in added)
+        with open(baseline_file, 'w') as baseline_out:
+            json.dump(stored, baseline_out, indent=2)
+        print('')
+        print('Baseline of', ', '.join(added), 'written to', baseline_file)
+    regressions = compare(results, baseline)
+    print('')
+    for name, message in regressions:
+        print('REGRESSION', name + ':', message)
+    print('Benchmarks Complete!' if not regressions else str(len(regressions)) + ' regression(s) found!')
+    return regressions
+
+
+if __name__ == '__main__':
+    sys.exit(1 if main() else 0)
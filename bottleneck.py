@@ -0,0 +1,175 @@
+import utilization
+
+# Active period method (Roser et al.): a position or robot is active while it is busy (see utilization.py)
+# and inactive while it is blocked, starved or waiting for a pallet in transit. At any instant the
+# bottleneck is the one whose active period covering that instant is the longest. Where two consecutive
+# bottleneck periods of different stations overlap, the bottleneck is shifting between them and both
+# count as shifting bottlenecks for the overlap; the rest of a bottleneck period is a sole bottleneck.
+#
+# The detector runs alongside the simulation: an instant is attributed as soon as no active period
+# still open can cover it, after which the periods that ended before it are dropped. Only the periods
+# overlapping the unattributed stretch are kept, so memory stays small however long the run is.
+
+# detect bottlenecks during runs (cli.py run --bottleneck sets it for one run)
+enabled = False
+# most ended periods kept waiting for a long open period to end; beyond that the open periods are
+# counted with their length so far (bounds memory if a station is busy without a break for very long)
+max_pending = 10000
+
+# the detector of the most recently finished run
+detected = None
+
+
+# an active period of one position or robot: [start, end) in clock units
+class Period(object):
+    __slots__ = ('entity', 'start', 'end')
+
+    def __init__(self, entity, start, end):
+        self.entity = entity
+        self.start = start
+        self.end = end
+
+
+# the active periods of every position and robot, reduced to sole and shifting bottleneck time online
+class Detector(object):
+    def __init__(self, names):
+        self.names = names
+        # start of the entity's open active period (None: inactive)
+        self.active_since = [None] * len(names)
+        # ended periods that may still cover unattributed time, and the time attributed so far
+        self.pending = []
+        self.resolved = 0
+        # the current bottleneck period, where its stretch as bottleneck began and ends so far, and the
+        # end of the bottleneck period of another station before it (None: no such period)
+        self.current = None
+        self.segment_start = 0
+        self.segment_end = 0
+        self.previous_end = None
+        self.sole = [0] * len(names)
+        self.shifting = [0] * len(names)
+        # end of the shifting time counted so far for each entity
+        self.shifting_until = [0] * len(names)
+        self.shifts = 0
+        self.end = 0
+        # the momentary bottleneck when the run ended
+        self.final = None
+
+    # the entity is in the given utilization state from time on
+    def set(self, entity, time, state):
+        since = self.active_since[entity]
+        if state == utilization.BUSY:
+            if since is None:
+                self.active_since[entity] = time
+        elif since is not None:
+            self.active_since[entity] = None
+            if time > since:
+                self.pending.append(Period(entity, since, time))
+                self.resolve(time)
+
+    # attribute the time no open period can cover any more
+    def resolve(self, time):
+        open_starts = [since for since in self.active_since if since is not None]
+        frontier = min(open_starts) if open_starts else time
+        if len(self.pending) > max_pending:
+            # stop waiting: count the open periods with their length so far
+            self.attribute(time, [Period(entity, since, time) for entity, since in enumerate(self.active_since)
+                                  if since is not None and since < time])
+        elif frontier > self.resolved:
+            self.attribute(frontier, [])
+
+    # find the bottleneck of every instant from resolved up to the frontier
+    def attribute(self, frontier, extra):
+        periods = [period for period in self.pending + extra if period.end > self.resolved]
+        bounds = {self.resolved, frontier}
+        for period in periods:
+            bounds.update(bound for bound in (period.start, period.end) if self.resolved < bound < frontier)
+        bounds = sorted(bounds)
+        for start, end in zip(bounds, bounds[1:]):
+            # the longest covering period, ties going to the first position or robot
+            covering = [period for period in periods if period.start <= start and period.end >= end]
+            if covering:
+                self.bottleneck(max(covering, key=lambda period: (period.end - period.start, -period.entity)),
+                                start, end)
+        self.resolved = frontier
+        self.pending = [period for period in self.pending if period.end > frontier]
+
+    # the period is the bottleneck over [start, end)
+    def bottleneck(self, period, start, end):
+        current = self.current
+        if current is period and self.segment_end == start:
+            self.segment_end = end
+            return
+        previous_end = None
+        if current is not None:
+            self.close_segment(period)
+            if period.entity != current.entity:
+                # both are shifting bottlenecks where their periods overlap, each instant counted once
+                start_shared = max(current.start, period.start)
+                end_shared = min(current.end, period.end)
+                for entity in (current.entity, period.entity):
+                    counted = max(start_shared, self.shifting_until[entity])
+                    if end_shared > counted:
+                        self.shifting[entity] += end_shared - counted
+                        self.shifting_until[entity] = end_shared
+                self.shifts += 1
+                previous_end = current.end
+        self.current = period
+        self.segment_start, self.segment_end = start, end
+        self.previous_end = previous_end
+
+    # count the current period's stretch as bottleneck as sole where it does not overlap the bottleneck
+    # periods of other stations before and after it
+    def close_segment(self, following=None):
+        current = self.current
+        start, end = self.segment_start, self.segment_end
+        if self.previous_end is not None:
+            start = min(max(start, self.previous_end), end)
+        if following is not None and following.entity != current.entity:
+            end = max(min(end, following.start), start)
+        self.sole[current.entity] += end - start
+
+    # end the open periods and attribute the rest of the run
+    def finish(self, time):
+        self.final = self.momentary(time)
+        for entity, since in enumerate(self.active_since):
+            if since is not None:
+                self.set(entity, time, None)
+        self.attribute(time, [])
+        if self.current is not None:
+            self.close_segment()
+            self.current = None
+        self.end = time
+
+    # the momentary bottleneck: the position or robot with the longest active period still running
+    # (None if nothing is active)
+    def momentary(self, time):
+        longest, name = None, None
+        for entity, since in enumerate(self.active_since):
+            if since is not None and (longest is None or time - since > longest):
+                longest, name = time - since, self.names[entity]
+        return name
+
+    # sole and shifting bottleneck shares of the run by name, most frequent bottleneck first
+    def shares(self):
+        total = self.end or 1
+        shares = {name: (self.sole[entity] / total, self.shifting[entity] / total)
+                  for entity, name in enumerate(self.names) if self.sole[entity] or self.shifting[entity]}
+        return dict(sorted(shares.items(), key=lambda item: -sum(item[1])))
+
+    # the average bottleneck: the one that is a (sole or shifting) bottleneck most of the time
+    def average(self):
+        return next(iter(self.shares()), None)
+
+    # bottleneck shifts between different positions or robots per hour
+    def shift_rate(self, resolution):
+        return self.shifts / (self.end / resolution / 3600) if self.end else 0.0
+
+
+def print_report(detector, resolution):
+    print('')
+    print('Average bottleneck:', detector.average())
+    print('Momentary bottleneck at the end of the run:', detector.final)
+    print('Bottleneck shifts per hour: ' + str(round(detector.shift_rate(resolution), 1)))
+    print('{0:<26}{1:>10}{2:>10}'.format('', 'sole', 'shifting'))
+    for name, (sole, shifting) in detector.shares().items():
+        print('{0:<26}{1:>9.1f}%{2:>9.1f}%'.format(name, sole * 100, shifting * 100))
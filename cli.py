@@ -0,0 +1,161 @@
+import argparse
+import json
+import sys
+
+# Command line entry point:
+#   python cli.py run [--set NAME=VALUE ...] [--runtime HOURS] [--seed SEED] [--engine tick|event|lockstep]
+#   python cli.py sweep [--design grid|random|latin hypercube] [--level NAME=V1,V2,...] [--range NAME=LOW,HIGH]
+#   python cli.py bench [--only NAME ...] [--update-baseline]
+# Parameter names are those of sweep.py. Every subcommand imports only the modules it runs, so NumPy is
+# loaded by the first random draw of a simulated run (or by the lock-step engine), not by --help, argument
+# errors or runs read from the result cache, and matplotlib never.
+
+
+# a command line value as JSON where it parses (numbers, lists, true/false), as a string otherwise
+def parse_value(text):
+    try:
+        return json.loads(text)
+    except ValueError:
+        return text
+
+
+# 'NAME=VALUE' pairs as a configuration dict
+def parse_assignments(pairs):
+    config = {}
+    for pair in pairs or []:
+        name, separator, value = pair.partition('=')
+        if not separator:
+            raise SystemExit('expected NAME=VALUE, got ' + repr(pair))
+        config[name] = parse_value(value)
+    return config
+
+
+# 'NAME=V1,V2,...' items as a dict of value lists
+def parse_lists(items):
+    lists = {}
+    for item in items or []:
+        name, separator, values = item.partition('=')
+        if not separator:
+            raise SystemExit('expected NAME=V1,V2,..., got ' + repr(item))
+        lists[name] = [parse_value(value) for value in values.split(',')]
+    return lists
+
+
+def run(args):
+    import api
+
+    config = parse_assignments(args.set)
+    if args.engine == 'lockstep' and (args.utilization or args.bottleneck or args.profile):
+        raise SystemExit('--utilization, --bottleneck and --profile need the tick or event engine')
+    if args.engine == 'lockstep':
+        import replications
+
+        print('Simulating', args.count or 'the configured number of', 'replications in lock-step...')
+        replications.print_summary(api.simulate_lockstep(config, args.count, args.seed, args.runtime))
+        print('')
+        print('Simulation Complete!')
+        return 0
+    import pallet_track
+
+    if args.engine:
+        config['pallet_track.engine'] = args.engine
+    if args.utilization:
+        import utilization
+
+        utilization.enabled = True
+    if args.bottleneck:
+        import bottleneck
+
+        bottleneck.enabled = True
+    if args.profile:
+        import profiling
+
+        profiling.enabled = True
+    print('Simulation Running...')
+    result = api.simulate(config, args.seed, args.runtime, cache=not args.no_cache)
+    pallet_track.print_summary(result.outputs)
+    print('Throughput: ' + str(round(result.throughput, 1)) + ' pallets per hour')
+    pallet_track.print_reports()
+    print('')
+    print('Simulation Complete!')
+    return 0
+
+
+def sweep(args):
+    import sweep as sweep_module
+
+    if args.design:
+        sweep_module.design = args.design
+    if args.level:
+        sweep_module.levels = parse_lists(args.level)
+    if args.range:
+        sweep_module.ranges = {name: tuple(bounds) for name, bounds in parse_lists(args.range).items()}
+    if args.points:
+        sweep_module.points = args.points
+    if args.seed is not None:
+        sweep_module.seed = args.seed
+    if args.workers:
+        sweep_module.workers = args.workers
+    if args.output is not None:
+        sweep_module.output_file = args.output or None
+    sweep_module.main(parse_assignments(args.set))
+    return 0
+
+
+def bench(args):
+    import bench as bench_module
+
+    bench_module.update_baseline = args.update_baseline
+    for name in args.only or []:
+        if name not in bench_module.benchmarks:
+            raise SystemExit('unknown benchmark ' + repr(name) + ', one of: ' + ', '.join(bench_module.benchmarks))
+    return 1 if bench_module.main(args.only) else 0
+
+
+def parser():
+    top = argparse.ArgumentParser(prog='cli.py', description='Monte Carlo pallet line simulation')
+    commands = top.add_subparsers(dest='command', required=True)
+
+    run_command = commands.add_parser('run', help='simulate one configuration')
+    run_command.add_argument('--set', action='append', metavar='NAME=VALUE', help='set a parameter (repeatable)')
+    run_command.add_argument('--runtime', type=float, help='simulated hours')
+    run_command.add_argument('--seed', type=int, default=1, help='master seed')
+    run_command.add_argument('--engine', choices=('tick', 'event', 'lockstep'),
+                             help='simulation engine, lockstep runs many replications with NumPy')
+    run_command.add_argument('--count', type=int, help='lock-step replications')
+    run_command.add_argument('--no-cache', action='store_true', help='always simulate, bypassing result_cache')
+    run_command.add_argument('--utilization', action='store_true',
+                             help='report the busy/blocked/starved/transit shares and write utilization.csv')
+    run_command.add_argument('--bottleneck', action='store_true',
+                             help='report the sole and shifting bottlenecks by the active period method')
+    run_command.add_argument('--profile', action='store_true',
+                             help='report the wall time and state changes of every pallet and station check')
+    run_command.set_defaults(handler=run)
+
+    sweep_command = commands.add_parser('sweep', help='run a design over the parameters in parallel')
+    sweep_command.add_argument('--design', choices=('grid', 'random', 'latin hypercube'))
+    sweep_command.add_argument('--level', action='append', metavar='NAME=V1,V2,...', help='grid levels (repeatable)')
+    sweep_command.add_argument('--range', action='append', metavar='NAME=LOW,HIGH',
+                               help='random and latin hypercube range (repeatable)')
+    sweep_command.add_argument('--points', type=int, help='random and latin hypercube points')
+    sweep_command.add_argument('--set', action='append', metavar='NAME=VALUE',
+                               help='parameter fixed at every point (repeatable)')
+    sweep_command.add_argument('--seed', type=int)
+    sweep_command.add_argument('--workers', type=int)
+    sweep_command.add_argument('--output', help='result table CSV (empty: print only)')
+    sweep_command.set_defaults(handler=sweep)
+
+    bench_command = commands.add_parser('bench', help='run the benchmarks against the baseline')
+    bench_command.add_argument('--only', action='append', metavar='NAME', help='run only this benchmark (repeatable)')
+    bench_command.add_argument('--update-baseline', action='store_true', help='overwrite the baseline of the benchmarks run')
+    bench_command.set_defaults(handler=bench)
+    return top
+
+
+def main(argv=None):
+    args = parser().parse_args(argv)
+    return args.handler(args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
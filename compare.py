@@ -0,0 +1,108 @@
+import itertools
+import math
+import os
+import statistics
+from concurrent.futures import ProcessPoolExecutor
+
+import replications
+import sweep
+
+# the two configurations to compare, as sweep parameters (see sweep.py), e.g. another line layout
+# with {'pallet_track.line_file': 'lines/parallel_buffer.json'}
+config_a = {}
+config_b = {'pallet_track.pallet_positions[16].transit_time': 2.0}
+# number of replication pairs
+pairs = 20
+# master seed the per-pair seeds are drawn from
+seed = 1
+# common random numbers: both configurations of a pair run with the same seed, so every component
+# draws the same random numbers in both and the difference is not swamped by sampling noise
+# (False: independent seeds, for comparison)
+common_random_numbers = True
+# confidence level of the reported intervals
+confidence = 0.95
+# worker processes (None: one per core)
+workers = None
+# check accelerated feeders against step-by-step ones instead of comparing config_a with config_b
+check_accelerated_feeders = False
+# the line of that check: a low pick probability, where feeders skip the most failed shuffles
+accelerated_check = {'station2_3.pick_prob': 0.05, 'station14.pick_prob': 0.05}
+
+
+# run both configurations of one pair, returns the (b - a) difference of each output's mean
+def run_pair(seeds, a=None, b=None):
+    outputs = []
+    for config, pair_seed in zip((config_a if a is None else a, config_b if b is None else b), seeds):
+        saved = sweep.apply_parameters(config)
+        try:
+            outputs.append(replications.replication_runner()(pair_seed))
+        finally:
+            sweep.restore_parameters(saved)
+    return {name: outputs[1][name][0] - outputs[0][name][0] for name in outputs[0]}
+
+
+# mean difference and confidence interval of each output over count replication pairs
+def run_comparison(a=None, b=None, count=pairs, master_seed=seed, crn=common_random_numbers,
+                   conf=confidence, max_workers=workers):
+    seeds = replications.replication_seeds(2 * count, master_seed)
+    pair_seeds = [(seeds[i], seeds[i] if crn else seeds[count + i]) for i in range(count)]
+    with ProcessPoolExecutor(max_workers=max_workers, initializer=replications.quiet_worker) as pool:
+        outputs = list(pool.map(run_pair, pair_seeds, itertools.repeat(a), itertools.repeat(b)))
+    summary = {}
+    for name in outputs[0]:
+        # pairs in which either configuration had no samples of the output are left out
+        differences = [output[name] for output in outputs if not math.isnan(output[name])]
+        if len(differences) < 2:
+            summary[name] = {'mean': math.nan, 'ci': (math.nan, math.nan), 'half_width': math.inf,
+                             'count': len(differences)}
+            continue
+        mean = sum(differences) / len(differences)
+        half_width = (replications.t_critical(conf, len(differences) - 1) * statistics.stdev(differences) /
+                      math.sqrt(len(differences)))
+        summary[name] = {'mean': mean, 'ci': (mean - half_width, mean + half_width), 'half_width': half_width,
+                         'count': len(differences)}
+    return summary
+
+
+# step-by-step (A) against accelerated (B) feeders of station2_3 and station14 on independent seeds (the
+# two modes draw different random numbers); returns the summary and the outputs whose difference interval
+# excludes zero, i.e. whose mean accelerated mode moves (expect about 1 - conf of them by chance)
+def check_accelerated(count=pairs, master_seed=seed, conf=confidence, max_workers=workers):
+    accelerated = dict(accelerated_check, **{'station2_3.accelerated': True, 'station14.accelerated': True})
+    summary = run_comparison(accelerated_check, accelerated, count, master_seed, False, conf, max_workers)
+    shifted = [name for name, result in summary.items()
+               if result['count'] >= 2 and not result['ci'][0] <= 0 <= result['ci'][1]]
+    return summary, shifted
+
+
+def print_summary(summary, conf=confidence):
+    print('')
+    for name, result in summary.items():
+        if name == 'Overall':
+            print('')
+            label = 'Overall takt time'
+        else:
+            label = name + ' cycle time'
+        if result['count'] < 2:
+            print(label + ' difference (B - A): too few pairs with samples')
+            continue
+        print(label + ' difference (B - A) mean [' + str(round(conf * 100)) + '% CI]: ' +
+              str(round(result['mean'], 4)) +
+              ' [' + str(round(result['ci'][0], 4)) + ', ' + str(round(result['ci'][1], 4)) + ']')
+
+
+if __name__ == '__main__':
+    if check_accelerated_feeders:
+        print('Checking accelerated feeders against step-by-step ones at', accelerated_check, 'over', pairs,
+              'pairs of independent seeds...')
+        summary, shifted = check_accelerated()
+        print_summary(summary)
+        print('')
+        print('Outputs moved by accelerated mode:', ', '.join(shifted) if shifted else 'none')
+    else:
+        print('Comparing', config_a or 'the current line', 'with', config_b, 'over', pairs, 'pairs on',
+              workers or os.cpu_count(), 'processes',
+              '(common random numbers)...' if common_random_numbers else '(independent seeds)...')
+        print_summary(run_comparison())
+    print('')
+    print('Comparison Complete!')
@@ -0,0 +1,145 @@
+import array
+import json
+import struct
+import sys
+
+import scheduler
+
+# record component events (when off, components skip tracing entirely)
+enabled = False
+# names of the components to record (None: all), e.g. ['ST8', 'ST9', 'ST8 Handling']
+components = None
+# binary file the buffer is flushed to when full and at the end of a run
+# (None: keep only the most recent 'capacity' events in memory)
+output_file = 'events.bin'
+# events held in memory between flushes
+capacity = 1 << 16
+
+# column name and array typecode of each record field (times in integer clock units, see scheduler.py)
+columns = (('time', 'q'), ('component', 'H'), ('event', 'B'), ('payload', 'i'))
+
+# names behind the integer component ids / event types of the current log
+component_names = []
+event_names = []
+event_ids = {}
+
+# preallocated ring buffer, one array per column
+buffers = {}
+index = 0
+wrapped = False
+
+
+# integer code of an event type, registered once at import by the modules that record it
+def event_type(name):
+    if name not in event_ids:
+        event_ids[name] = len(event_names)
+        event_names.append(name)
+    return event_ids[name]
+
+
+# integer id for a component to record events under, None if the component is not being recorded
+def register(name):
+    if not enabled or (components is not None and name not in components):
+        return None
+    component_names.append(name)
+    return len(component_names) - 1
+
+
+# start a new log: forget registered components, allocate the buffer and truncate the output file
+def reset():
+    global index, wrapped
+    del component_names[:]
+    index = 0
+    wrapped = False
+    buffers.clear()
+    if enabled:
+        for name, typecode in columns:
+            buffers[name] = array.array(typecode, bytes(array.array(typecode).itemsize * capacity))
+        if output_file:
+            open(output_file, 'wb').close()
+
+
+# append one event to the buffer, flushing (or wrapping around) when it is full
+def record(time, component, event, payload):
+    global index, wrapped
+    buffers['time'][index] = time
+    buffers['component'][index] = component
+    buffers['event'][index] = event
+    buffers['payload'][index] = payload
+    index += 1
+    if index == capacity:
+        if output_file:
+            flush()
+        else:
+            index = 0
+            wrapped = True
+
+
+# write the buffered events to the output file as one columnar chunk: event count, then each column
+def flush():
+    global index
+    if output_file and index:
+        with open(output_file, 'ab') as out:
+            out.write(struct.pack('<I', index))
+            for name, typecode in columns:
+                out.write(buffers[name][:index].tobytes())
+        index = 0
+
+
+# flush what is left and write the names behind the ids next to the log
+def close():
+    if enabled and output_file:
+        flush()
+        with open(output_file + '.json', 'w') as out:
+            json.dump({'components': component_names,
+                       'events': event_names,
+                       'columns': columns,
+                       'resolution': scheduler.resolution,
+                       'byteorder': sys.byteorder}, out)
+
+
+# events still held in memory, oldest first, as (time in seconds, component, event, payload) tuples
+def recent():
+    order = list(range(index, capacity)) + list(range(index)) if wrapped else list(range(index))
+    return [(scheduler.seconds(buffers['time'][i]), buffers['component'][i], buffers['event'][i], buffers['payload'][i])
+            for i in order]
+
+
+# read a log file into NumPy arrays, one per column (times in seconds), plus the component and event names
+def load(path=output_file):
+    import numpy as np
+
+    with open(path + '.json') as meta_file:
+        meta = json.load(meta_file)
+    with open(path, 'rb') as log_file:
+        data = log_file.read()
+    chunks = {name: [] for name, typecode in columns}
+    offset = 0
+    while offset < len(data):
+        count = struct.unpack_from('<I', data, offset)[0]
+        offset += 4
+        for name, typecode in columns:
+            dtype = np.dtype(typecode)
+            if meta['byteorder'] != sys.byteorder:
+                dtype = dtype.newbyteorder()
+            chunks[name].append(np.frombuffer(data, dtype, count, offset))
+            offset += count * dtype.itemsize
+    log = {name: np.concatenate(parts) if parts else np.empty(0, typecode) for name, parts in chunks.items()}
+    log['time'] = log['time'] / meta['resolution']
+    log['component_names'] = meta['components']
+    log['event_names'] = meta['events']
+    return log
+
+
+# print a log file as one line per event
+def print_events(path=output_file):
+    log = load(path)
+    for time, component, event, payload in zip(log['time'], log['component'], log['event'], log['payload']):
+        print("{0:6.2f}".format(time),
+              log['component_names'][component],
+              log['event_names'][event],
+              payload)
+
+
+if __name__ == '__main__':
+    print_events(sys.argv[1] if len(sys.argv) > 1 else output_file)
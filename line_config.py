@@ -0,0 +1,148 @@
+import json
+import os
+
+# A line layout (a dict, or a JSON/TOML file holding one) looks like
+#   {"name": "Main line",
+#    "positions": [{"position": 1, "station": "ST1", "transit_time": 0.51, "cycle_time": 2.34},
+#                  ...
+#                  {"position": 15, "station": "ST13", "transit_time": 0.46, "cycle_time": 2.39,
+#                   "next": [16, 22], "divert": "first free"},
+#                  ...],
+#    "bindings": {"ST2 Robot": 3, ...},
+#    "takt_position": 21}
+# positions are numbered 1..n and by default release to the next number, the last one back to 1.
+# 'next' lists the downstream positions of a position; with more than one it is a divert, and
+# parallel lanes are diverts whose lanes release to the same merge position.
+# 'bindings' maps station controller names to the position they work on and 'takt_position' is the
+# position whose completions time the overall takt (default: the last position).
+
+# how a divert picks a downstream position for a completed pallet
+# 'first free': the first listed position that is clear
+# 'alternate': the first clear position after the one used last (round robin)
+divert_rules = ('first free', 'alternate')
+
+layout_keys = ('name', 'positions', 'bindings', 'takt_position')
+position_keys = ('position', 'station', 'transit_time', 'cycle_time', 'next', 'divert')
+
+
+# line layout compiled into lists indexed by position number (index 0 unused)
+class Line(object):
+    def __init__(self, layout):
+        positions = sorted(layout['positions'], key=lambda entry: entry['position'])
+        count = len(positions)
+        self.name = layout.get('name', '')
+        self.station_id = [None] + [entry['station'] for entry in positions]
+        self.transit_time = [0.0] + [float(entry['transit_time']) for entry in positions]
+        self.cycle_time = [0.0] + [float(entry['cycle_time']) for entry in positions]
+        # the one downstream position of each position, 0 where the position diverts
+        self.successor = [0] * (count + 1)
+        # downstream positions and rule of each divert, None elsewhere
+        self.routes = [None] * (count + 1)
+        self.divert_rule = [None] * (count + 1)
+        for entry in positions:
+            pos = entry['position']
+            downstream = next_positions(entry, count)
+            if len(downstream) == 1:
+                self.successor[pos] = downstream[0]
+            else:
+                self.routes[pos] = tuple(downstream)
+                self.divert_rule[pos] = entry.get('divert', divert_rules[0])
+        self.bindings = dict(layout.get('bindings', {}))
+        self.takt_position = layout.get('takt_position', count)
+
+    # one track where every position releases to the next and the last back to the first
+    def is_circular(self):
+        count = len(self.successor) - 1
+        return all(self.successor[pos] == pos % count + 1 for pos in range(1, count + 1))
+
+
+# downstream positions of a layout entry
+def next_positions(entry, count):
+    return list(entry.get('next', [entry['position'] % count + 1]))
+
+
+# layout of a single circular track from a pallet_positions style dict and controller bindings
+def from_parameters(pallet_positions, station_bindings, name='Main line'):
+    return {'name': name,
+            'positions': [{'position': pos,
+                           'station': pallet_positions[pos][0],
+                           'transit_time': pallet_positions[pos][1],
+                           'cycle_time': pallet_positions[pos][2]} for pos in sorted(pallet_positions)],
+            'bindings': dict(station_bindings)}
+
+
+# read a layout from a JSON or (on Python 3.11+) TOML file
+def load(path):
+    if os.path.splitext(path)[1].lower() == '.toml':
+        import tomllib
+
+        with open(path, 'rb') as layout_file:
+            return tomllib.load(layout_file)
+    with open(path) as layout_file:
+        return json.load(layout_file)
+
+
+# raise ValueError describing the first problem found in a layout
+def validate(layout):
+    def is_number(value):
+        return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+    if not isinstance(layout, dict):
+        raise ValueError('line layout must be a mapping')
+    for key in layout:
+        if key not in layout_keys:
+            raise ValueError('unknown line layout key ' + repr(key))
+    positions = layout.get('positions')
+    if not isinstance(positions, list) or not positions:
+        raise ValueError('line layout needs a non-empty list of positions')
+    count = len(positions)
+    numbers = set()
+    for entry in positions:
+        if not isinstance(entry, dict):
+            raise ValueError('position entries must be mappings')
+        for key in entry:
+            if key not in position_keys:
+                raise ValueError('unknown key ' + repr(key) + ' in position ' + repr(entry.get('position')))
+        pos = entry.get('position')
+        if not isinstance(pos, int) or isinstance(pos, bool) or not 1 <= pos <= count or pos in numbers:
+            raise ValueError('positions must be numbered 1..' + str(count) + ' without gaps, got ' + repr(pos))
+        numbers.add(pos)
+        if not isinstance(entry.get('station'), str):
+            raise ValueError('position ' + str(pos) + ' needs a station id')
+        for key in ('transit_time', 'cycle_time'):
+            if not is_number(entry.get(key)) or entry[key] < 0:
+                raise ValueError('position ' + str(pos) + ' needs a non-negative ' + key)
+    predecessors = dict.fromkeys(numbers, 0)
+    for entry in positions:
+        pos = entry['position']
+        listed = entry.get('next', [])
+        if not isinstance(listed, list) or not all(isinstance(target, int) and not isinstance(target, bool)
+                                                   for target in listed):
+            raise ValueError('position ' + str(pos) + ' needs a list of next positions')
+        downstream = next_positions(entry, count)
+        if not downstream or len(set(downstream)) != len(downstream):
+            raise ValueError('position ' + str(pos) + ' needs distinct next positions')
+        for target in downstream:
+            if target not in numbers or target == pos:
+                raise ValueError('position ' + str(pos) + ' releases to unknown position ' + repr(target))
+            predecessors[target] += 1
+        if 'divert' in entry and (len(downstream) < 2 or entry['divert'] not in divert_rules):
+            raise ValueError('position ' + str(pos) + ' divert must be one of ' + repr(divert_rules) +
+                             ' and needs several next positions')
+    for pos, incoming in predecessors.items():
+        if incoming == 0:
+            raise ValueError('no position releases to position ' + str(pos))
+    bindings = layout.get('bindings', {})
+    if not isinstance(bindings, dict):
+        raise ValueError('line layout bindings must map controller names to positions')
+    for name, pos in bindings.items():
+        if pos not in numbers:
+            raise ValueError('controller ' + repr(name) + ' is bound to unknown position ' + repr(pos))
+    if layout.get('takt_position', count) not in numbers:
+        raise ValueError('unknown takt position ' + repr(layout['takt_position']))
+
+
+# validate a layout and compile it into the indexed form the simulation runs on
+def compile_line(layout):
+    validate(layout)
+    return Line(layout)
@@ -1,3 +1,13 @@
+import bisect
+
+import bottleneck
+import event_log
+import line_config
+import profiling
+import scheduler
+import stats
+import streams
+import utilization
 import station2_3
 import station8_9
 import station10_11
@@ -32,238 +42,508 @@ pallet_clearing_time = 0.1
 pallet_count = 20
 # simulation runtime (in hours)
 runtime = 1
-# time-step increment (in seconds)
+# time-step increment (in seconds; the clock itself counts integer microseconds, see scheduler.py)
 time_inc = 0.01
-# list of stations to print actions for
-verbose = [10, 11]
+# simulation engine:
+# 'tick': visit every component on every time-step
+# 'event': jump the clock straight to the next scheduled completion and visit only the positions and
+#          station groups that are due or next to one that changed (same results, far less work)
+engine = 'event'
+# station modules, each initializing a controller per robot (or handling unit) it contains
+station_modules = (station2_3, station8_9, station10_11, station14)
+# vision stations as (module, robot names), each robot with a left and a right feeder;
+# shuttle stations as (module, handling robot names) sharing one shuttle, the first loading at side 0
+vision_stations = ((station2_3, ('ST2 Robot', 'ST3 Robot')),
+                   (station14, ('ST14 Robot', 'ST15 Robot')))
+shuttle_stations = ((station8_9, ('ST8 Handling', 'ST9 Handling')),
+                    (station10_11, ('ST10 Handling', 'ST11 Handling')))
+# controller name: position of the pallet stop it works on
+# (controllers bound to the same position must all finish before that pallet is complete)
+station_bindings = {'ST2 Robot': 3,
+                    'ST3 Robot': 4,
+                    'ST8 Handling': 10,
+                    'ST9 Handling': 11,
+                    'ST10 Handling': 12,
+                    'ST11 Handling': 13,
+                    'ST14 Robot': 17,
+                    'ST15 Robot': 17}
+# JSON or TOML file with the line layout, see line_config.py
+# (None: the single circular track of pallet_positions above with station_bindings)
+line_file = None
 
 # initialize variables
-position = {}
-pallet = {}
+# pallet stops by position number and pallets by pallet id (index 0 unused, pallet 0 means 'no pallet')
+position = [None]
+pallet = [None]
+# position each position releases its pallet to, wrapping around the circular track
+successor = [0]
+# downstream positions and rule of each divert (None: the position releases to its successor)
+routes = [None]
+divert_rule = [None]
+# index into routes of the next downstream position an 'alternate' divert tries first
+next_route = [0]
+# controllers bound to each position (None: the pallet completes after the stop's own cycle time)
+bound = [None]
+# position whose completions time the overall takt
+takt_position = 0
 cycle_clock = 0
 prev_cycle_clock = 0
-unload_cycle_times = []
+unload_cycle_times = stats.StreamingStats()
+
+# event log types
+PALLET_ARRIVED = event_log.event_type('pallet arrived')
+PALLET_RELEASED = event_log.event_type('pallet released')
 
 
 # define the Pallet Stop class
 class PalletStop(object):
+    __slots__ = ('position', 'station_id', 'upstream_transit_time', 'cycle_time', 'clearing_time',
+                 'current_pallet', 'last_empty', 'last_occupied', 'process_complete', 'inbound', 'trace')
+
     def __init__(self, position, station_id, upstream_transit_time, cycle_time):
         self.position = position
         self.station_id = station_id
-        self.upstream_transit_time = upstream_transit_time
-        self.cycle_time = cycle_time
+        # times in clock units
+        self.upstream_transit_time = scheduler.units(upstream_transit_time)
+        self.cycle_time = scheduler.units(cycle_time)
+        self.clearing_time = scheduler.units(pallet_clearing_time)
         self.current_pallet = 0
-        self.time_in_station = 0
-        self.time_without_pallet = 0
+        # time-steps at which the current pallet arrived / the last one was released
+        # (the time in station and the time without a pallet are read off them when needed)
+        self.last_empty = -scheduler.step
+        self.last_occupied = -scheduler.step
         self.process_complete = False
+        # pallet travelling towards the stop (0: none), so merging positions cannot both release to it
+        self.inbound = 0
+        self.trace = event_log.register(station_id)
 
-    def release(self, time):
-        if int(self.position) in verbose:
-            print("{0:6.2f}".format(time), 'releasing pallet', self.current_pallet, 'from', self.station_id)
-        pallet[str(self.current_pallet)].release(time)
+    def release(self, time, target):
+        if self.trace is not None:
+            event_log.record(time, self.trace, PALLET_RELEASED, self.current_pallet)
+        pallet[self.current_pallet].release(time, target)
         self.current_pallet = 0
         self.process_complete = False
-        self.time_in_station = 0
+        self.last_occupied = time
+        # the upstream stop may release once this one has been clear long enough
+        scheduler.wake_elapsed(time, self.clearing_time)
 
-    def check_status(self, time):
-        if self.current_pallet != 0:
-            self.time_in_station += time_inc
-            self.time_without_pallet = 0
-        else:
-            self.time_without_pallet += time_inc
+    # clock units the current pallet has spent at the stop
+    def time_in_station(self, time):
+        return time - self.last_empty if self.current_pallet else 0
+
+    # has the stop been empty, with no pallet on its way, for longer than the clearing time
+    def is_clear(self, time):
+        return not self.current_pallet and not self.inbound and time - self.last_occupied > self.clearing_time
 
 
 # define the Pallet class
 class Pallet(object):
+    __slots__ = ('pallet_id', 'current_position', 'last_position', 'next_position', 'in_transit',
+                 'transit_start_time')
+
     def __init__(self, pallet_id, init_position):
         self.pallet_id = pallet_id
         self.current_position = init_position
         self.last_position = 0
+        self.next_position = 0
         self.in_transit = False
         self.transit_start_time = 0
 
-    def release(self, time):
+    def release(self, time, target):
         self.in_transit = True
         self.transit_start_time = time
         self.last_position = self.current_position
+        self.next_position = target
         self.current_position = 0
+        position[target].inbound = self.pallet_id
+        scheduler.wake_after(time, position[target].upstream_transit_time)
 
     def check_status(self, time):
         if self.in_transit:
-            next_position = self.last_position + 1
-            if next_position > len(pallet_positions):
-                next_position = 1
-            if self.transit_start_time + position[str(next_position)].upstream_transit_time < time:
+            next_position = self.next_position
+            stop = position[next_position]
+            if self.transit_start_time + stop.upstream_transit_time < time:
                 self.in_transit = False
                 self.transit_start_time = 0
-                position[str(next_position)].current_pallet = self.pallet_id
-                if int(position[str(next_position)].position) in verbose:
-                    print("{0:6.2f}".format(time),
-                          'Pallet',
-                          position[str(next_position)].current_pallet,
-                          'arrived at',
-                          position[str(next_position)].station_id)
+                stop.current_pallet = self.pallet_id
+                stop.last_empty = time
+                stop.inbound = 0
+                scheduler.wake_elapsed(time, stop.cycle_time)
+                if stop.trace is not None:
+                    event_log.record(time, stop.trace, PALLET_ARRIVED, self.pallet_id)
                 self.current_position = next_position
 
 
-# run the simulation
-def run_simulation():
-    global prev_cycle_clock
-    print('Simulation Running...')
+# a run in progress: the controllers bound to the line and the position of the clock
+# (stops, pallets and the takt bookkeeping live in the module variables above)
+#
+# The event engine visits units: each pallet position (its stop and the pallet arriving at it) and each
+# station group (the controllers of one station module, which share feeders, vision or shuttles).
+# A unit is visited on a tick when one of its wake-ups is due, when it changed on the tick before,
+# or when a neighbouring unit did either; a unit that changes during a step also has its neighbours
+# visited in the rest of that step. Every other unit would find nothing to do.
+class Simulation(object):
+    def __init__(self, line, controllers, groups):
+        self.line = line
+        self.controllers = controllers
+        self.bindings = [(pos, controllers[name]) for name, pos in line.bindings.items()]
+        self.engine = engine
+        # the pallet checks each step runs (profiling swaps in timed wrappers)
+        self.pallet_status_check = pallet_status_check
+        self.pallet_decision_tree = pallet_decision_tree
+        # units 1..position_count are the positions, the station groups (indices into bindings) follow
+        self.position_count = len(line.successor) - 1
+        names = list(line.bindings)
+        self.groups = [[names.index(name) for name in group] for group in groups if group]
+        self.positions = list(range(1, self.position_count + 1))
+        self.group_units = list(range(self.position_count + 1, self.position_count + len(self.groups) + 1))
+        self.neighbors = self.unit_neighbors()
+        # next tick to simulate, the units with wake-ups due on it and the units that changed on the
+        # tick before (event engine)
+        self.tick = 0
+        self.due = set(self.neighbors)
+        self.hot = set()
+        # time in each state of every position and robot, and the bottlenecks among them (None: not recorded)
+        entity_names = [line.station_id[pos] for pos in self.positions] + names
+        self.utilization = None
+        if utilization.enabled:
+            self.utilization = utilization.Recorder(
+                entity_names,
+                ['position'] * self.position_count + ['robot'] * len(names),
+                scheduler.units(utilization.bin_width))
+        self.bottlenecks = bottleneck.Detector(entity_names) if bottleneck.enabled else None
+        # everything that follows the states of the positions and robots
+        self.observers = [observer for observer in (self.utilization, self.bottlenecks) if observer is not None]
+        if self.observers:
+            # indices into bindings of the robots at each position
+            self.position_robots = {}
+            for index, (pos, controller) in enumerate(self.bindings):
+                self.position_robots.setdefault(pos, []).append(index)
 
-    # initial conditions
-    time = 0
-    for pos in pallet_positions:
-        station_id, transit_time, cycle_time = pallet_positions.get(pos)
-        position[str(pos)] = PalletStop(pos, station_id, transit_time, cycle_time)
+    # each unit and the units its changes can enable: a position's upstream and downstream positions and
+    # station groups, a station group's positions
+    def unit_neighbors(self):
+        neighbors = {unit: {unit} for unit in self.positions + self.group_units}
+        for pos in self.positions:
+            for target in self.line.routes[pos] or [self.line.successor[pos]]:
+                neighbors[pos].add(target)
+                neighbors[target].add(pos)
+        for unit, group in zip(self.group_units, self.groups):
+            for index in group:
+                pos = self.bindings[index][0]
+                neighbors[unit].add(pos)
+                neighbors[pos].add(unit)
+        return {unit: frozenset(units) for unit, units in neighbors.items()}
 
-    for pal in range(1, pallet_count + 1):
-        pallet[str(pal)] = Pallet(pal, pal)
-        position[str(pal)].current_pallet = pal
-
-    # initialize station 2&3
-    l_feed_2, r_feed_2, robot_2, l_feed_3, r_feed_3, robot_3, vision_2_3 = station2_3.initialize()
-
-    # initialize station 8&9
-    st8_handling, st9_handling, st8_9_feeder = station8_9.initialize()
-
-    # initialize station 10&11
-    st10_handling, st11_handling, st10_11_feeder = station10_11.initialize()
-
-    # initialize station 14
-    l_feed_14a, r_feed_14a, robot_14a, l_feed_14b, r_feed_14b, robot_14b, vision_14 = station14.initialize()
-
-    sim_active = True
-
-    while sim_active:
-        pallet_status_check(time)
-        station2_3.status_check(time, l_feed_2, r_feed_2, robot_2, vision_2_3)
-        station2_3.status_check(time, l_feed_3, r_feed_3, robot_3, vision_2_3)
-        station8_9.status_check(time, st8_handling, st8_9_feeder)
-        station8_9.status_check(time, st9_handling, st8_9_feeder)
-        station10_11.status_check(time, st10_handling, st10_11_feeder)
-        station10_11.status_check(time, st11_handling, st10_11_feeder)
-        station14.status_check(time, l_feed_14a, r_feed_14a, robot_14a, vision_14)
-        station14.status_check(time, l_feed_14b, r_feed_14b, robot_14b, vision_14)
-
-        pallet_decision_tree(time, robot_2, robot_3, robot_14a, robot_14b, st8_handling, st9_handling, st10_handling, st11_handling)
-        station2_3.decision_tree(time, l_feed_2, r_feed_2, robot_2, position['3'])
-        station2_3.decision_tree(time, l_feed_3, r_feed_3, robot_3, position['4'])
-        station8_9.decision_tree(time, st8_handling, st8_9_feeder, position['10'])
-        station8_9.decision_tree(time, st9_handling, st8_9_feeder, position['11'])
-        station10_11.decision_tree(time, st10_handling, st10_11_feeder, position['12'])
-        station10_11.decision_tree(time, st11_handling, st10_11_feeder, position['13'])
-        station14.decision_tree(time, l_feed_14a, r_feed_14a, robot_14a, position['17'])
-        station14.decision_tree(time, l_feed_14b, r_feed_14b, robot_14b, position['17'])
+    # advance every component by one time-step
+    def step(self, time):
+        self.visit(time, self.positions, self.group_units)
+
+    # advance the given set of units and their neighbours (and those of units that change, which are added
+    # to the set) by one time-step
+    def step_units(self, time, sources):
+        units = set()
+        for unit in sources:
+            units |= self.neighbors[unit]
+        positions, group_units = self.split(units)
+        self.visit(time, positions, group_units, sources, units)
+
+    # the positions and the station groups among the units, each in order
+    def split(self, units):
+        ordered = sorted(units)
+        index = bisect.bisect_right(ordered, self.position_count)
+        return ordered[:index], ordered[index:]
+
+    # one time-step of the given positions and station groups, in the order of the full step; with the
+    # units whose neighbours are visited given, units that change pull in theirs for the remaining checks
+    def visit(self, time, positions, group_units, sources=None, units=None):
+        global prev_cycle_clock
+        count = self.position_count
+        self.pallet_status_check(time, positions)
+        for unit in group_units:
+            scheduler.current = unit
+            for index in self.groups[unit - count - 1]:
+                self.bindings[index][1].status_check(time)
+
+        if sources is not None and not scheduler.hot <= sources:
+            self.expand(sources, units)
+            positions, group_units = self.split(units)
+        self.pallet_decision_tree(time, positions)
+
+        if sources is not None and not scheduler.hot <= sources:
+            self.expand(sources, units)
+            group_units = self.split(units)[1]
+        for unit in group_units:
+            scheduler.current = unit
+            for index in self.groups[unit - count - 1]:
+                pos, controller = self.bindings[index]
+                controller.decision_tree(time, position[pos])
 
         if prev_cycle_clock != cycle_clock and prev_cycle_clock != 0:
-            unload_cycle_times.append(cycle_clock - prev_cycle_clock)
+            unload_cycle_times.add(scheduler.seconds(cycle_clock - prev_cycle_clock))
             prev_cycle_clock = cycle_clock
-        time += time_inc
 
-        if time > runtime * 3600:
-            # print ST2 Robot Cycle Time Data
-            print('')
-            print('ST2 Robot avg/max cycle time: ' +
-                  str(round(sum(robot_2.cycle_times) / len(robot_2.cycle_times), 3)) +
-                  ' / ' +
-                  str(round(max(robot_2.cycle_times), 3)))
-            # print ST3 Robot Cycle Time Data
-            print('ST3 Robot avg/max cycle time: ' +
-                  str(round(sum(robot_3.cycle_times) / len(robot_3.cycle_times), 3)) +
-                  ' / ' +
-                  str(round(max(robot_3.cycle_times), 3)))
-            # print ST8 Handling Cycle Time Data
-            print('ST8 Handling avg/max cycle time: ' +
-                  str(round(sum(st8_handling.cycle_times) / len(st8_handling.cycle_times), 3)) +
-                  ' / ' +
-                  str(round(max(st8_handling.cycle_times), 3)))
-            # print ST9 Handling Cycle Time Data
-            print('ST9 Handling avg/max cycle time: ' +
-                  str(round(sum(st9_handling.cycle_times) / len(st9_handling.cycle_times), 3)) +
-                  ' / ' +
-                  str(round(max(st9_handling.cycle_times), 3)))
-            # print ST10 Handling Cycle Time Data
-            print('ST10 Handling avg/max cycle time: ' +
-                  str(round(sum(st10_handling.cycle_times) / len(st10_handling.cycle_times), 3)) +
-                  ' / ' +
-                  str(round(max(st10_handling.cycle_times), 3)))
-            # print ST11 Handling Cycle Time Data
-            print('ST11 Handling avg/max cycle time: ' +
-                  str(round(sum(st11_handling.cycle_times) / len(st11_handling.cycle_times), 3)) +
-                  ' / ' +
-                  str(round(max(st11_handling.cycle_times), 3)))
-            # print ST14a Robot Cycle Time Data
-            print('ST14 Robot avg/max cycle time: ' +
-                  str(round(sum(robot_14a.cycle_times) / len(robot_14a.cycle_times), 3)) +
-                  ' / ' +
-                  str(round(max(robot_14a.cycle_times), 3)))
-            # print ST14b Robot Cycle Time Data
-            print('ST15 Robot avg/max cycle time: ' +
-                  str(round(sum(robot_14b.cycle_times) / len(robot_14b.cycle_times), 3)) +
-                  ' / ' +
-                  str(round(max(robot_14b.cycle_times), 3)))
-            # print Overall Cycle Time Data
-            print('')
-            print('Overall avg/max takt time: ' +
-                  str(round(sum(unload_cycle_times) / len(unload_cycle_times), 3)) +
-                  ' / ' +
-                  str(round(max(unload_cycle_times), 3)))
-            sim_active = False
-            print('')
-            print('Simulation Complete!')
+        if self.observers:
+            # everything a changed unit can have changed lies within the visited units
+            self.record_states(time, *(self.split(units) if units is not None else (positions, group_units)))
 
+    # the state of the given positions and of the robots bound to them or in the given station groups from
+    # time on (a robot's state also follows its stop, e.g. when a pallet is released towards it)
+    def record_states(self, time, positions, group_units):
+        observers = self.observers
+        count = self.position_count
+        robots = set()
+        for pos in positions:
+            state = utilization.position_state(position[pos])
+            for observer in observers:
+                observer.set(pos - 1, time, state)
+            robots.update(self.position_robots.get(pos, ()))
+        for unit in group_units:
+            robots.update(self.groups[unit - count - 1])
+        for index in robots:
+            pos, controller = self.bindings[index]
+            state = utilization.robot_state(controller.robot, position[pos])
+            for observer in observers:
+                observer.set(count + index, time, state)
 
-# checks the current status of all pallets
-def pallet_status_check(time):
-    for pos in position:
-        position[pos].check_status(time)
-    for pal in pallet:
-        pallet[pal].check_status(time)
+    # add the neighbours of every unit that changed so far to the visited units
+    def expand(self, sources, units):
+        for unit in scheduler.hot - sources:
+            units |= self.neighbors[unit]
+            sources.add(unit)
 
+    # the cycle time statistics of each robot and of the overall takt time so far
+    def results(self):
+        results = {name: self.controllers[name].robot.cycle_times for name in self.line.bindings}
+        results['Overall'] = unload_cycle_times
+        return results
 
-#
-def pallet_decision_tree(time, robot_2, robot_3, robot_14a, robot_14b, st8_handling, st9_handling, st10_handling, st11_handling):
+
+# set up the line at time 0 with pallets 1..pallet_count on positions 1..pallet_count,
+# every random component drawing from its own stream of the master seed (antithetic: the mirrored streams)
+def start_simulation(seed=None, antithetic=False):
+    global cycle_clock, prev_cycle_clock, unload_cycle_times, takt_position
+
+    # initial conditions
+    streams.reset(seed, antithetic)
+    line = load_line()
+    if pallet_count > len(line.successor) - 1:
+        raise ValueError(str(pallet_count) + ' pallets do not fit on ' + str(len(line.successor) - 1) + ' positions')
+    position[:] = [None] * len(line.successor)
+    pallet[:] = [None] * (pallet_count + 1)
+    successor[:] = line.successor
+    routes[:] = line.routes
+    divert_rule[:] = line.divert_rule
+    next_route[:] = [0] * len(line.successor)
+    takt_position = line.takt_position
+    cycle_clock = 0
+    prev_cycle_clock = 0
+    unload_cycle_times = stats.StreamingStats()
+    scheduler.reset(time_inc, engine == 'event')
+    event_log.reset()
+    for pos in range(1, len(position)):
+        position[pos] = PalletStop(pos, line.station_id[pos], line.transit_time[pos], line.cycle_time[pos])
+        scheduler.current = pos
+        scheduler.wake_elapsed(-scheduler.step, position[pos].clearing_time)
+
+    for pal in range(1, pallet_count + 1):
+        pallet[pal] = Pallet(pal, pal)
+        position[pal].current_pallet = pal
+        scheduler.current = pal
+        scheduler.wake_elapsed(-scheduler.step, position[pal].cycle_time)
+
+    # initialize the station controllers and bind them to their positions
+    controllers, groups = {}, []
+    for module in station_modules:
+        group = module.initialize()
+        controllers.update(group)
+        groups.append([name for name in group if name in line.bindings])
+    for name in line.bindings:
+        if name not in controllers:
+            raise ValueError('controller ' + repr(name) + ' is bound to position ' + str(line.bindings[name]) +
+                             ' but no station module has it, known controllers: ' + ', '.join(controllers))
+    sim = Simulation(line, controllers, groups)
+    bound[:] = [None] * len(position)
+    for pos, controller in sim.bindings:
+        if bound[pos] is None:
+            bound[pos] = []
+        bound[pos].append(controller)
+    if profiling.enabled:
+        profiling.instrument(sim, position, pallet)
+    return sim
+
+
+# simulate up to and including the last time-step before end_time (in seconds)
+def advance(sim, end_time):
+    # the clock is kept as an integer tick count and read in integer clock units
+    last_tick = scheduler.first_tick_after(scheduler.units(end_time)) - 1
+    tick, step = sim.tick, scheduler.step
+    if sim.engine == 'tick':
+        while tick <= last_tick:
+            sim.step(tick * step)
+            tick += 1
+    else:
+        due, hot = sim.due, sim.hot
+        while tick <= last_tick:
+            scheduler.hot.clear()
+            sim.step_units(tick * step, due | hot)
+            # completions and newly started actions can enable decisions on the very next tick
+            hot = due | scheduler.hot
+            if hot:
+                tick += 1
+            elif scheduler.queue:
+                tick = scheduler.queue[0][0]
+            else:
+                tick = last_tick + 1
+            due = scheduler.pop_due(tick)
+        sim.due, sim.hot = due, hot
+    sim.tick = tick
+
+
+# run the simulation, returns the cycle time statistics of each robot and of the overall takt time
+def run_simulation(seed=None, antithetic=False):
+    sim = start_simulation(seed, antithetic)
+    advance(sim, runtime * 3600)
+    event_log.close()
+    end = scheduler.first_tick_after(scheduler.units(runtime * 3600)) * scheduler.step
+    for observer in sim.observers:
+        observer.finish(end)
+    utilization.recorded = sim.utilization
+    bottleneck.detected = sim.bottlenecks
+    return sim.results()
+
+
+# everything a run depends on besides the parameters: module state, the run (whose components hold their
+# random streams), the scheduler and the stream seeding
+def get_state(sim):
+    return {'position': position,
+            'pallet': pallet,
+            'successor': successor,
+            'routes': routes,
+            'divert_rule': divert_rule,
+            'next_route': next_route,
+            'bound': bound,
+            'takt_position': takt_position,
+            'cycle_clock': cycle_clock,
+            'prev_cycle_clock': prev_cycle_clock,
+            'unload_cycle_times': unload_cycle_times,
+            'scheduler': (scheduler.time_inc, scheduler.step, scheduler.enabled, scheduler.queue),
+            'streams': (streams.master_seed, streams.antithetic),
+            'sim': sim}
+
+
+# reinstate a state taken by get_state, returns the run to continue with advance
+def set_state(state):
+    global takt_position, cycle_clock, prev_cycle_clock, unload_cycle_times
+    for name in ('position', 'pallet', 'successor', 'routes', 'divert_rule', 'next_route', 'bound'):
+        globals()[name][:] = state[name]
+    takt_position = state['takt_position']
+    cycle_clock = state['cycle_clock']
+    prev_cycle_clock = state['prev_cycle_clock']
+    unload_cycle_times = state['unload_cycle_times']
+    scheduler.time_inc, scheduler.step, scheduler.enabled, queue = state['scheduler']
+    scheduler.queue[:] = queue
+    streams.master_seed, streams.antithetic = state['streams']
+    return state['sim']
+
+
+# the compiled line layout of line_file, or of pallet_positions and station_bindings
+def load_line():
+    if line_file is None:
+        return line_config.compile_line(line_config.from_parameters(pallet_positions, station_bindings))
+    return line_config.compile_line(line_config.load(line_file))
+
+
+# lands the pallets that have reached the stops at the given positions
+def pallet_status_check(time, positions):
+    for pos in positions:
+        inbound = position[pos].inbound
+        if inbound:
+            scheduler.current = pos
+            pallet[inbound].check_status(time)
+
+
+# completes and releases pallets at the given positions:
+# bound positions complete once all of their controllers' robots have finished
+def pallet_decision_tree(time, positions):
     global cycle_clock, prev_cycle_clock
-    for pos in position:
-        if pos == '3':
-            if robot_2.process_complete:
-                position[pos].process_complete = True
-                robot_2.process_complete = False
-        elif pos == '4':
-            if robot_3.process_complete:
-                position[pos].process_complete = True
-                robot_3.process_complete = False
-        elif pos == '10':
-            if st8_handling.process_complete:
-                position[pos].process_complete = True
-                st8_handling.process_complete = False
-        elif pos == '11':
-            if st9_handling.process_complete:
-                position[pos].process_complete = True
-                st9_handling.process_complete = False
-        elif pos == '12':
-            if st10_handling.process_complete:
-                position[pos].process_complete = True
-                st10_handling.process_complete = False
-        elif pos == '13':
-            if st11_handling.process_complete:
-                position[pos].process_complete = True
-                st11_handling.process_complete = False
-        elif pos == '17':
-            if robot_14a.process_complete and robot_14b.process_complete:
-                position[pos].process_complete = True
-                robot_14a.process_complete, robot_14b.process_complete = False, False
-        elif position[pos].time_in_station > position[pos].cycle_time and not position[pos].process_complete:
-            position[pos].process_complete = True
-            if pos == '21':
+    for pos in positions:
+        scheduler.current = pos
+        stop = position[pos]
+        controllers = bound[pos]
+        completed = False
+        if controllers is not None:
+            for controller in controllers:
+                if not controller.robot.process_complete:
+                    break
+            else:
+                completed = True
+                for controller in controllers:
+                    controller.robot.process_complete = False
+        elif stop.time_in_station(time) > stop.cycle_time and not stop.process_complete:
+            completed = True
+        if completed:
+            stop.process_complete = True
+            if pos == takt_position:
                 prev_cycle_clock = cycle_clock
                 cycle_clock = time
-        next_pos = int(pos) + 1
-        if next_pos > len(pallet_positions):
-            next_pos = 1
-        if position[pos].process_complete and position[str(next_pos)].time_without_pallet > pallet_clearing_time:
-            position[pos].release(time)
+        if stop.process_complete:
+            target = successor[pos] or divert(pos, time)
+            if target and position[target].is_clear(time):
+                stop.release(time, target)
+
+
+# downstream position a divert can release to now (0: none of them is clear)
+def divert(pos, time):
+    candidates = routes[pos]
+    start = next_route[pos] if divert_rule[pos] == 'alternate' else 0
+    for i in range(len(candidates)):
+        index = (start + i) % len(candidates)
+        if position[candidates[index]].is_clear(time):
+            next_route[pos] = index + 1
+            return candidates[index]
+    return 0
+
+
+# print avg/max and p50/p95/p99 cycle time of each robot and the overall takt time
+def print_summary(results):
+    print('')
+    for name, cycle_times in results.items():
+        if name == 'Overall':
+            # print Overall Cycle Time Data
+            print('')
+            label = 'Overall avg/max takt time: '
+        else:
+            label = name + ' avg/max cycle time: '
+        if not cycle_times.count:
+            print(label + 'no samples')
+            continue
+        print(label +
+              str(round(cycle_times.mean, 3)) +
+              ' / ' +
+              str(round(cycle_times.max, 3)) +
+              '  (p50/p95/p99: ' +
+              ' / '.join(str(round(cycle_times.quantile(p), 3)) for p in stats.quantiles) +
+              ')')
 
 
-run_simulation()
+# print the reports of the analyses enabled in utilization, bottleneck and profiling for the last run
+def print_reports():
+    if utilization.enabled:
+        utilization.print_fractions(utilization.recorded)
+        if utilization.output_file:
+            utilization.write_table(utilization.recorded, scheduler.resolution, utilization.output_file)
+        if utilization.plot:
+            utilization.plot_robots(utilization.recorded, scheduler.resolution)
+    if bottleneck.enabled:
+        bottleneck.print_report(bottleneck.detected, scheduler.resolution)
+    if profiling.enabled:
+        profiling.print_report()
+
+
+if __name__ == '__main__':
+    print('Simulation Running...')
+    print_summary(run_simulation())
+    print_reports()
+    print('')
+    print('Simulation Complete!')
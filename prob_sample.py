@@ -1,19 +1,57 @@
 import random
-import matplotlib.pyplot as plt
 
 pick_prob = 0.6
+part_qty = 5
 sample_size = 100
 runs = 1000
-run_probs = []
+# sampler:
+# 'python': one random.choices() call per shuffle
+# 'vectorized': draw the whole runs x sample_size matrix at once with NumPy
+# 'exact': closed-form binomial probability, no sampling
+mode = 'vectorized'
+# show a histogram of the sampled runs
+plot = True
 
-for run in range(runs):
-    sample_set = []
-    for sample in range(sample_size):
-        pickable_parts = sum(random.choices([1, 0], [pick_prob, 1 - pick_prob], k=5))
-        sample_set.append(pickable_parts)
 
-    run_probs.append(100 - (sample_set.count(0) / sample_size * 100))
+# percentage of shuffles in each run that leave at least one pick-able part, one Python draw per shuffle
+def sample_runs(prob=pick_prob, qty=part_qty, run_count=runs, samples=sample_size):
+    run_probs = []
+    for run in range(run_count):
+        sample_set = []
+        for sample in range(samples):
+            pickable_parts = sum(random.choices([1, 0], [prob, 1 - prob], k=qty))
+            sample_set.append(pickable_parts)
 
-print('Mean:', sum(run_probs) / len(run_probs))
-plt.hist(run_probs)
-plt.show()
+        run_probs.append(100 - (sample_set.count(0) / samples * 100))
+    return run_probs
+
+
+# same as sample_runs, drawing every shuffle of every run in one binomial call;
+# prob may be a sequence of pick probabilities, which adds a leading axis to the result
+def sample_runs_vectorized(prob=pick_prob, qty=part_qty, run_count=runs, samples=sample_size, seed=None):
+    import numpy as np
+
+    rng = np.random.default_rng(seed)
+    prob = np.asarray(prob, dtype=float)
+    pickable_parts = rng.binomial(qty, prob[..., None, None], size=prob.shape + (run_count, samples))
+    return 100 - np.count_nonzero(pickable_parts == 0, axis=-1) / samples * 100
+
+
+# exact percentage of shuffles that leave at least one pick-able part: 1 - (1 - p)^n
+def exact_probability(prob=pick_prob, qty=part_qty):
+    return 100 * (1 - (1 - prob) ** qty)
+
+
+if __name__ == '__main__':
+    print('Exact:', exact_probability())
+    if mode != 'exact':
+        if mode == 'python':
+            run_probs = sample_runs()
+        else:
+            run_probs = sample_runs_vectorized().tolist()
+        print('Mean:', sum(run_probs) / len(run_probs))
+        if plot:
+            import matplotlib.pyplot as plt
+
+            plt.hist(run_probs)
+            plt.show()
@@ -0,0 +1,142 @@
+import time as clock
+
+import scheduler
+
+# time every pallet and station check of the main loop (cli.py run --profile sets it for one run; when off
+# nothing is wrapped)
+enabled = False
+
+# counters of the most recently instrumented run, by check name
+counters = {}
+# the run they belong to and the wall clock and tick when it was instrumented
+profiled = None
+wall_start = 0
+tick_start = 0
+# wall seconds spent on the profiling itself (state snapshots and counting), taken off the loop time
+bookkeeping = 0.0
+# wall seconds each timed call adds beyond its bookkeeping (calling the wrapper, reading the clock)
+call_overhead = 0.0
+# state_names of each class
+state_names_by_type = {}
+
+
+# call count, cumulative wall time and number of calls that changed state of one check
+class Counter(object):
+    def __init__(self):
+        self.calls = 0
+        self.seconds = 0.0
+        self.changed = 0
+
+
+# a check timed on every call; the discrete state of the objects the call works on (objects is given the
+# call's arguments) is compared before and after, outside the timed part, to count the calls that changed anything
+class ProfiledCall(object):
+    def __init__(self, name, function, objects):
+        self.function = function
+        self.objects = objects
+        self.counter = counters[name] = Counter()
+
+    def __call__(self, *args):
+        global bookkeeping
+        entered = clock.perf_counter()
+        objects = self.objects(*args)
+        before = discrete_state(objects)
+        start = clock.perf_counter()
+        self.function(*args)
+        end = clock.perf_counter()
+        self.counter.seconds += end - start
+        self.counter.calls += 1
+        if discrete_state(objects) != before:
+            self.counter.changed += 1
+        bookkeeping += start - entered + clock.perf_counter() - end
+
+
+# a station controller whose checks are timed
+class ProfiledController(object):
+    def __init__(self, name, controller):
+        def components(*args):
+            return vars(controller).values()
+
+        self.robot = controller.robot
+        self.status_check = ProfiledCall(name + ' status_check', controller.status_check, components)
+        self.decision_tree = ProfiledCall(name + ' decision_tree', controller.decision_tree, components)
+
+
+# attributes holding clock readings, which are integers like counts but are not discrete state
+def is_timestamp(name):
+    return (name.endswith('_start') or name.endswith('_start_time') or name.endswith('_clock') or
+            name in ('last_empty', 'last_occupied'))
+
+
+# attribute names of a class that are not clock readings, looked up once per class
+def state_names(obj):
+    names = state_names_by_type.get(type(obj))
+    if names is None:
+        names = state_names_by_type[type(obj)] = [name for name in getattr(obj, '__slots__', None) or vars(obj)
+                                                  if not is_timestamp(name)]
+    return names
+
+
+# flags, counts and names of the objects: everything but clock readings, timers and statistics
+def discrete_state(objects):
+    state = []
+    for obj in objects:
+        for name in state_names(obj):
+            value = getattr(obj, name)
+            if value is None or type(value) in (bool, int, str):
+                state.append(value)
+    return state
+
+
+# measure call_overhead on a timed call that does nothing
+def calibrate(count=20000):
+    global bookkeeping, call_overhead
+    call = ProfiledCall('calibration', lambda *args: None, lambda *args: ())
+    bookkeeping = 0.0
+    start = clock.perf_counter()
+    for _ in range(count):
+        call(0)
+    call_overhead = max(clock.perf_counter() - start - bookkeeping - call.counter.seconds, 0.0) / count
+
+
+# wrap the pallet checks and every bound controller of a run in timed calls (position and pallet are the
+# run's stops and pallets by number)
+def instrument(sim, position, pallet):
+    global profiled, wall_start, tick_start, bookkeeping
+
+    # the stops a pallet check is given and the pallets on them or on their way to them: anything the
+    # check changes (an arrival, a completion, a release) changes one of those
+    def pallets(time, positions):
+        stops = [position[pos] for pos in positions]
+        return stops + [pallet[pallet_id] for stop in stops
+                        for pallet_id in (stop.current_pallet, stop.inbound) if pallet_id]
+
+    calibrate()
+    counters.clear()
+    bookkeeping = 0.0
+    sim.pallet_status_check = ProfiledCall('pallet_status_check', sim.pallet_status_check, pallets)
+    sim.pallet_decision_tree = ProfiledCall('pallet_decision_tree', sim.pallet_decision_tree, pallets)
+    sim.bindings = [(pos, ProfiledController(name, controller))
+                    for name, (pos, controller) in zip(sim.line.bindings, sim.bindings)]
+    profiled = sim
+    wall_start = clock.perf_counter()
+    tick_start = sim.tick
+
+
+# print each check's share of the loop and the simulated seconds per wall second of the run, the loop's
+# wall time less the profiling bookkeeping
+def print_report():
+    overhead = bookkeeping + call_overhead * sum(counter.calls for counter in counters.values())
+    wall = clock.perf_counter() - wall_start - overhead
+    simulated = scheduler.seconds((profiled.tick - tick_start) * scheduler.step)
+    total = sum(counter.seconds for counter in counters.values()) or 1
+    print('')
+    print('{0:<30}{1:>10}{2:>10}{3:>10}{4:>8}{5:>10}'.format('check', 'calls', 'wall s', 'us/call', 'share', 'changed'))
+    for name, counter in sorted(counters.items(), key=lambda item: -item[1].seconds):
+        print('{0:<30}{1:>10}{2:>10.3f}{3:>10.2f}{4:>7.1f}%{5:>9.1f}%'.format(
+            name, counter.calls, counter.seconds, counter.seconds / max(counter.calls, 1) * 1e6,
+            counter.seconds / total * 100, counter.changed / max(counter.calls, 1) * 100))
+    print('')
+    print('Simulated ' + str(round(simulated, 1)) + ' s in ' + str(round(wall, 2)) + ' wall s (' +
+          str(round(overhead, 2)) + ' s of profiling bookkeeping left out): ' +
+          str(round(simulated / wall, 1)) + ' simulated seconds per wall second')
@@ -0,0 +1,168 @@
+import math
+import os
+import random
+import statistics
+from concurrent.futures import ProcessPoolExecutor
+
+import event_log
+import pallet_track
+import result_cache
+
+# number of independent replications to run
+replications = 20
+# master seed the per-replication seeds are drawn from (None: seed from system entropy)
+seed = 1
+# confidence level of the reported intervals
+confidence = 0.95
+# worker processes (None: one per core)
+workers = None
+# run every replication as an antithetic pair (the second run mirrors every uniform draw u to 1 - u)
+# and count the pair's average as one lower-variance observation
+antithetic = False
+# keep adding batches of replications until the CI half-width (in seconds) of each of these outputs
+# is at most its target, e.g. {'Overall': 0.01, 'ST14 Robot': 0.01, 'ST15 Robot': 0.01}
+# (None: run the fixed number of replications above)
+targets = None
+# replications per batch (None: one per worker process)
+batch_size = None
+# fewest replications a sequential run may stop at, so a lucky early interval cannot end it
+min_replications = 5
+# most replications a sequential run may use
+max_replications = 1000
+
+
+# two-sided Student t critical value for the given confidence level and degrees of freedom
+def t_critical(conf, df):
+    p = 0.5 + conf / 2
+    if df == 1:
+        return math.tan(math.pi * (p - 0.5))
+    if df == 2:
+        return (2 * p - 1) / math.sqrt(2 * p * (1 - p))
+    # Cornish-Fisher expansion of the t quantile around the normal quantile
+    z = statistics.NormalDist().inv_cdf(p)
+    g1 = (z ** 3 + z) / 4
+    g2 = (5 * z ** 5 + 16 * z ** 3 + 3 * z) / 96
+    g3 = (3 * z ** 7 + 19 * z ** 5 + 17 * z ** 3 - 15 * z) / 384
+    g4 = (79 * z ** 9 + 776 * z ** 7 + 1482 * z ** 5 - 1920 * z ** 3 - 945 * z) / 92160
+    return z + g1 / df + g2 / df ** 2 + g3 / df ** 3 + g4 / df ** 4
+
+
+# mean, confidence interval and max over the per-replication (mean, max) pairs of one output
+def summarize(samples, conf=confidence):
+    # replications in which the output had no samples (mean nan) are left out
+    samples = [sample for sample in samples if not math.isnan(sample[0])]
+    if not samples:
+        return {'mean': math.nan, 'ci': (math.nan, math.nan), 'half_width': math.inf, 'max': math.nan,
+                'count': 0}
+    means = [sample[0] for sample in samples]
+    mean = sum(means) / len(means)
+    if len(means) > 1:
+        half_width = t_critical(conf, len(means) - 1) * statistics.stdev(means) / math.sqrt(len(means))
+    else:
+        half_width = math.inf
+    return {'mean': mean,
+            'ci': (mean - half_width, mean + half_width),
+            'half_width': half_width,
+            'max': max(sample[1] for sample in samples),
+            'count': len(means)}
+
+
+# draw one independent seed per replication from the master seed
+def replication_seeds(count, master_seed=seed):
+    seeder = random.Random(master_seed)
+    return [seeder.getrandbits(64) for _ in range(count)]
+
+
+# keep worker processes from writing event logs over each other
+def quiet_worker():
+    event_log.enabled = False
+
+
+# run one replication (or read it from the result cache) and reduce it to (mean, max) per output so only a
+# few numbers cross processes
+def run_replication(replication_seed, mirror=False):
+    results = result_cache.run_simulation(replication_seed, mirror)
+    return {name: (cycle_times.mean, cycle_times.max) for name, cycle_times in results.items()}
+
+
+# run a replication and its antithetic twin, reduced to one (mean, max) per output over the runs in which
+# the output had samples ((nan, nan) if neither had any)
+def run_antithetic_pair(replication_seed):
+    first = run_replication(replication_seed)
+    second = run_replication(replication_seed, True)
+    pairs = {}
+    for name in first:
+        runs = [run[name] for run in (first, second) if not math.isnan(run[name][0])]
+        pairs[name] = ((sum(mean for mean, _ in runs) / len(runs), max(maximum for _, maximum in runs))
+                       if runs else (math.nan, math.nan))
+    return pairs
+
+
+# the replication runner of the configured variance reduction
+def replication_runner():
+    return run_antithetic_pair if antithetic else run_replication
+
+
+# run independent replications across a process pool and summarize each output
+def run_replications(count=replications, master_seed=seed, conf=confidence, max_workers=workers):
+    seeds = replication_seeds(count, master_seed)
+    with ProcessPoolExecutor(max_workers=max_workers, initializer=quiet_worker) as pool:
+        outputs = list(pool.map(replication_runner(), seeds))
+    return {name: summarize([output[name] for output in outputs], conf) for name in outputs[0]}
+
+
+# run replications in parallel batches until every target half-width is reached (or max_count replications
+# have run), returns the summary of each output and the number of replications used
+def run_sequential(output_targets, master_seed=seed, conf=confidence, max_workers=workers,
+                   batch=batch_size, max_count=max_replications):
+    # a misspelt output would only show once a batch has run
+    names = list(pallet_track.load_line().bindings) + ['Overall']
+    for name in output_targets:
+        if name not in names:
+            raise ValueError('no output ' + repr(name) + ' to target, known outputs: ' + ', '.join(names))
+    # seeds come from one fixed sequence, so the result does not depend on the batch size
+    seeds = replication_seeds(max_count, master_seed)
+    outputs = []
+    with ProcessPoolExecutor(max_workers=max_workers, initializer=quiet_worker) as pool:
+        batch = batch or max_workers or os.cpu_count()
+        while len(outputs) < max_count:
+            outputs += pool.map(replication_runner(), seeds[len(outputs):len(outputs) + batch])
+            summary = {name: summarize([output[name] for output in outputs], conf) for name in outputs[0]}
+            if len(outputs) >= min_replications and \
+                    all(summary[name]['half_width'] <= target for name, target in output_targets.items()):
+                break
+    return summary, len(outputs)
+
+
+# print mean, confidence interval and max of each output
+def print_summary(summary, conf=confidence):
+    print('')
+    for name, result in summary.items():
+        if name == 'Overall':
+            print('')
+            label = 'Overall takt time'
+        else:
+            label = name + ' cycle time'
+        if not result['count']:
+            print(label + ': no samples')
+            continue
+        print(label + ' mean [' + str(round(conf * 100)) + '% CI] / max: ' +
+              str(round(result['mean'], 3)) +
+              ' [' + str(round(result['ci'][0], 3)) + ', ' + str(round(result['ci'][1], 3)) + ']' +
+              ' / ' +
+              str(round(result['max'], 3)))
+
+
+if __name__ == '__main__':
+    if targets:
+        print('Running replications on', workers or os.cpu_count(), 'processes until the',
+              ', '.join(targets), 'intervals are narrow enough...')
+        summary, count = run_sequential(targets)
+        print_summary(summary)
+        print('')
+        print('Replications used:', count, '(antithetic pairs)' if antithetic else '')
+    else:
+        print('Running', replications, 'replications on', workers or os.cpu_count(), 'processes...')
+        print_summary(run_replications())
+    print('')
+    print('Replications Complete!')
@@ -0,0 +1,223 @@
+import hashlib
+import importlib.util
+import json
+import os
+import pickle
+import shutil
+import string
+import tempfile
+import time as clock
+import zlib
+
+import bottleneck
+import event_log
+import line_config
+import pallet_track
+import profiling
+import scheduler
+import stats
+import streams
+import utilization
+import station2_3
+import station8_9
+import station10_11
+import station14
+
+# Finished runs are kept on disk under a hash of everything their results depend on: the line layout,
+# every station module parameter, the runtime and the seed. Identical runs, e.g. the unchanged points
+# of a rerun sweep, are then read back instead of simulated. Entries sit in a directory named after a
+# hash of the model's source code, so editing the model invalidates them all at once. Directories of other
+# code versions are removed once no run has used them for stale_age (another checkout sharing the cache
+# may still be running with its version).
+
+# read and write the cache (False: always simulate)
+enabled = True
+# directory of the cache
+cache_dir = 'result_cache'
+# most bytes the cache may hold, the least recently used entries are evicted beyond that
+max_size = 256 * 1024 * 1024
+# keep the compressed event log of a run next to its results when event_log is enabled
+store_traces = True
+# seconds after its last use that the directory of another code version is removed
+stale_age = 7 * 24 * 3600
+
+# modules whose source makes up the model code version
+model_modules = (pallet_track, scheduler, streams, stats, line_config, event_log, profiling,
+                 station2_3, station8_9, station10_11, station14)
+# pallet_track parameters the results depend on (station modules count with all of their parameters)
+line_parameters = ('pallet_positions', 'pallet_clearing_time', 'pallet_count', 'runtime', 'time_inc',
+                   'engine', 'station_bindings', 'line_file')
+
+# the version directory has been checked for stale siblings in this process
+checked = False
+# code version of this process (None: not hashed yet)
+version = None
+
+
+# hash of the model's source code and of the NumPy version behind the random streams, read from its
+# version file so a cache hit does not have to import NumPy
+def code_version():
+    global version
+    if version is None:
+        paths = [module.__file__ for module in model_modules]
+        spec = importlib.util.find_spec('numpy')
+        if spec is not None and spec.origin:
+            paths.append(os.path.join(os.path.dirname(spec.origin), 'version.py'))
+        digest = hashlib.sha256()
+        for path in paths:
+            with open(path, 'rb') as source:
+                digest.update(source.read())
+        version = digest.hexdigest()[:16]
+    return version
+
+
+# lower-case module globals other than modules and functions: a station module's parameters
+def module_parameters(module):
+    return {name: value for name, value in vars(module).items()
+            if name.islower() and not name.startswith('_') and
+            not callable(value) and not isinstance(value, type(os))}
+
+
+# the full effective configuration of a run, as a JSON-serializable dict
+def configuration(seed, antithetic):
+    config = {name: getattr(pallet_track, name) for name in line_parameters}
+    if pallet_track.line_file is not None:
+        # the layout itself, not just its file name
+        with open(pallet_track.line_file, 'rb') as layout:
+            config['line_file'] = hashlib.sha256(layout.read()).hexdigest()
+    config['pallet_positions'] = sorted(config['pallet_positions'].items())
+    config['station_modules'] = {module.__name__: module_parameters(module) for module in pallet_track.station_modules}
+    config['keep_samples'] = stats.keep_samples
+    config['seed'] = seed
+    config['antithetic'] = antithetic
+    return config
+
+
+# content address of a run
+def cache_key(seed, antithetic):
+    text = json.dumps(configuration(seed, antithetic), sort_keys=True, default=repr)
+    return hashlib.sha256(text.encode()).hexdigest()
+
+
+# is a directory name a code version (16 hex digits), anything else in cache_dir is left alone
+def is_version(name):
+    return len(name) == 16 and all(digit in string.hexdigits for digit in name)
+
+
+# directory of the current code version's entries; on first use it is marked as used now and the
+# directories of other versions unused for stale_age are removed
+def version_dir():
+    global checked
+    path = os.path.join(cache_dir, code_version())
+    if not checked:
+        os.makedirs(path, exist_ok=True)
+        os.utime(path)
+        for name in os.listdir(cache_dir):
+            other = os.path.join(cache_dir, name)
+            if other == path or not is_version(name):
+                continue
+            try:
+                unused = clock.time() - os.path.getmtime(other)
+            except OSError:
+                continue
+            if os.path.isdir(other) and unused > stale_age:
+                shutil.rmtree(other, ignore_errors=True)
+        checked = True
+    return path
+
+
+# the entry of a key, None on a miss; a hit is marked as recently used
+def lookup(key):
+    path = os.path.join(version_dir(), key)
+    try:
+        with open(path, 'rb') as entry_file:
+            entry = pickle.loads(zlib.decompress(entry_file.read()))
+        os.utime(path)
+    except (OSError, EOFError, zlib.error, pickle.UnpicklingError):
+        return None
+    return entry
+
+
+# write an entry atomically (parallel workers may store the same key) and evict down to max_size
+def store(key, entry):
+    directory = version_dir()
+    # recreated if another checkout sharing the cache has removed it meanwhile
+    os.makedirs(directory, exist_ok=True)
+    handle, temp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    with os.fdopen(handle, 'wb') as entry_file:
+        entry_file.write(zlib.compress(pickle.dumps(entry, pickle.HIGHEST_PROTOCOL)))
+    os.replace(temp_path, os.path.join(directory, key))
+    evict(directory)
+
+
+# remove the least recently used entries until the directory fits in max_size
+def evict(directory):
+    entries = []
+    for name in os.listdir(directory):
+        try:
+            info = os.stat(os.path.join(directory, name))
+        except OSError:
+            continue
+        entries.append((info.st_mtime, info.st_size, name))
+    total = sum(size for _, size, _ in entries)
+    for _, size, name in sorted(entries):
+        if total <= max_size:
+            break
+        try:
+            os.remove(os.path.join(directory, name))
+        except OSError:
+            pass
+        total -= size
+
+
+# the event log files of the run just finished, compressed
+def read_traces():
+    traces = {}
+    for path in (event_log.output_file, event_log.output_file + '.json'):
+        with open(path, 'rb') as trace_file:
+            traces[path] = zlib.compress(trace_file.read())
+    return traces
+
+
+def write_traces(traces):
+    for path, data in traces.items():
+        with open(path, 'wb') as trace_file:
+            trace_file.write(zlib.decompress(data))
+
+
+# pallet_track.run_simulation, read from the cache when the same run has been stored before;
+# runs seeded from system entropy and runs recording utilization, bottlenecks or a profile are never cached
+def run_simulation(seed=None, antithetic=False):
+    if not enabled or seed is None or utilization.enabled or bottleneck.enabled or profiling.enabled:
+        return pallet_track.run_simulation(seed, antithetic)
+    tracing = store_traces and event_log.enabled and bool(event_log.output_file)
+    key = cache_key(seed, antithetic)
+    entry = lookup(key)
+    if entry is not None and (not tracing or entry['traces'] is not None and
+                              entry['trace_components'] == event_log.components):
+        if tracing:
+            write_traces(entry['traces'])
+        return entry['results']
+    results = pallet_track.run_simulation(seed, antithetic)
+    store(key, {'results': results,
+                'traces': read_traces() if tracing else None,
+                'trace_components': event_log.components})
+    return results
+
+
+# remove every entry of every code version
+def clear():
+    global checked
+    if os.path.isdir(cache_dir):
+        for name in os.listdir(cache_dir):
+            if is_version(name):
+                shutil.rmtree(os.path.join(cache_dir, name), ignore_errors=True)
+    checked = False
+
+
+if __name__ == '__main__':
+    directory = version_dir()
+    names = os.listdir(directory)
+    size = sum(os.path.getsize(os.path.join(directory, name)) for name in names)
+    print('Result cache', directory + ':', len(names), 'entries,', round(size / 1024), 'kB of',
+          round(max_size / 1024), 'kB')
@@ -0,0 +1,73 @@
+import heapq
+
+# clock units per second: the clock and every duration are integer microseconds, so completion tests
+# compare integers and no run depends on how its times happen to round
+resolution = 1000000
+# time-step increment of the clock being scheduled, in seconds and in clock units
+time_inc = 0.01
+step = 10000
+# wake-ups are only recorded while the event-driven engine is running
+enabled = False
+# pending wake-ups as (tick, unit) pairs (min-heap)
+queue = []
+# unit (pallet position or station group) the engine is visiting, whose wake-ups are requested now
+current = 0
+# units that requested wake-ups, i.e. started or finished something, since the engine last cleared it
+hot = set()
+
+
+# clear all pending wake-ups and bind the scheduler to a clock
+def reset(inc, enable):
+    global time_inc, step, enabled, current
+    time_inc = inc
+    step = units(inc)
+    enabled = enable
+    current = 0
+    del queue[:]
+    hot.clear()
+
+
+# seconds in clock units
+def units(seconds):
+    return round(seconds * resolution)
+
+
+# clock units in seconds
+def seconds(clock_units):
+    return clock_units / resolution
+
+
+# first tick whose clock reading (tick * step) is strictly greater than t (in clock units)
+def first_tick_after(t):
+    return max(t // step + 1, 0)
+
+
+# request a visit of the current unit at a specific tick
+def wake(tick):
+    if enabled:
+        heapq.heappush(queue, (tick, current))
+        hot.add(current)
+
+
+# request a visit on the first tick satisfying 'start + duration < time'
+# (the completion test used by every timed action)
+def wake_after(start, duration):
+    if enabled:
+        wake(first_tick_after(start + duration))
+
+
+# request a visit on the first tick satisfying 'time - since > duration'
+# (the dwell/clearing test used by the pallet stops)
+def wake_elapsed(since, duration):
+    if enabled:
+        wake(first_tick_after(since + duration))
+
+
+# drop every wake-up up to and including tick, returns the set of units due exactly at tick
+def pop_due(tick):
+    due = set()
+    while queue and queue[0][0] <= tick:
+        wake_tick, unit = heapq.heappop(queue)
+        if wake_tick == tick:
+            due.add(unit)
+    return due
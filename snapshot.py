@@ -0,0 +1,122 @@
+import os
+import pickle
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+
+import event_log
+import pallet_track
+import replications
+import stats
+import streams
+
+# warm-up run length (in hours) before the snapshot is taken
+warmup = 0.25
+# number of replications forked from the snapshot
+forks = 20
+# master seed for the warm-up run and the per-fork seeds
+seed = 1
+# discard the cycle times recorded during the warm-up in every fork
+clear_warmup = True
+# where to keep the snapshot (None: memory only)
+output_file = None
+# worker processes (None: one per core)
+workers = None
+
+# the snapshot each worker process forks its replications from
+worker_snapshot = None
+
+
+# compact snapshot of a run in progress: stops, pallets, every station component with its random
+# stream, the clock and the pending wake-ups
+def take(sim):
+    return zlib.compress(pickle.dumps(pallet_track.get_state(sim), pickle.HIGHEST_PROTOCOL))
+
+
+# reinstate a snapshot, returns the run to continue with pallet_track.advance;
+# a seed reseeds the random streams so forks diverge (None keeps the snapshot's streams, e.g. for what-if branches)
+def restore(data, seed=None, clear_stats=False):
+    sim = pallet_track.set_state(pickle.loads(zlib.decompress(data)))
+    if seed is not None:
+        streams.reset(seed, streams.antithetic)
+        for component in components(sim):
+            if hasattr(component, 'rng'):
+                component.rng = streams.stream(component.name)
+    if clear_stats:
+        pallet_track.unload_cycle_times = stats.StreamingStats()
+        for controller in sim.controllers.values():
+            controller.robot.cycle_times = stats.StreamingStats()
+    retrace(sim)
+    return sim
+
+
+# every feeder, robot, vision controller and shuttle of the run, once each
+def components(sim):
+    seen = set()
+    for controller in sim.controllers.values():
+        for component in vars(controller).values():
+            if id(component) not in seen:
+                seen.add(id(component))
+                yield component
+
+
+# start a new event log and register the restored components with it
+def retrace(sim):
+    event_log.reset()
+    for stop in pallet_track.position[1:]:
+        stop.trace = event_log.register(stop.station_id)
+    for component in components(sim):
+        component.trace = event_log.register(component.name)
+
+
+def save(data, path):
+    with open(path, 'wb') as snapshot_file:
+        snapshot_file.write(data)
+
+
+def load(path):
+    with open(path, 'rb') as snapshot_file:
+        return snapshot_file.read()
+
+
+# run the line from time 0 up to end_time (in seconds) and snapshot it
+def warm_up(end_time, warmup_seed=seed):
+    sim = pallet_track.start_simulation(warmup_seed)
+    pallet_track.advance(sim, end_time)
+    return take(sim)
+
+
+def fork_worker(data):
+    global worker_snapshot
+    replications.quiet_worker()
+    worker_snapshot = data
+
+
+# continue one fork of the worker's snapshot up to pallet_track.runtime, reduced to (mean, max) per output
+def run_fork(fork_seed, clear_stats=clear_warmup):
+    sim = restore(worker_snapshot, fork_seed, clear_stats)
+    pallet_track.advance(sim, pallet_track.runtime * 3600)
+    return {name: (cycle_times.mean, cycle_times.max) for name, cycle_times in sim.results().items()}
+
+
+# fork replications from one snapshot across a process pool and summarize each output
+def run_forks(data, count=forks, master_seed=seed, conf=replications.confidence, max_workers=workers):
+    seeds = replications.replication_seeds(count, master_seed)
+    with ProcessPoolExecutor(max_workers=max_workers, initializer=fork_worker, initargs=(data,)) as pool:
+        outputs = list(pool.map(run_fork, seeds))
+    return {name: replications.summarize([output[name] for output in outputs], conf) for name in outputs[0]}
+
+
+if __name__ == '__main__':
+    replications.quiet_worker()
+    if output_file and os.path.exists(output_file):
+        print('Loading snapshot', output_file + '...')
+        snapshot = load(output_file)
+    else:
+        print('Warming up for', warmup, 'hours...')
+        snapshot = warm_up(warmup * 3600)
+        if output_file:
+            save(snapshot, output_file)
+    print('Forking', forks, 'replications from a', len(snapshot), 'byte snapshot...')
+    replications.print_summary(run_forks(snapshot))
+    print('')
+    print('Replications Complete!')
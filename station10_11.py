@@ -1,3 +1,7 @@
+import event_log
+import scheduler
+import stats
+
 
 
 # robot program times
@@ -7,26 +11,30 @@ robot_prog_times = {'pick': 0.95,
 
 shuttle_duration = 0.25
 
-# Verbosity:
-# ______________________
-# 0: None
-# 1: All
-verbose = 0
+# event log types
+SHUTTLE = event_log.event_type('shuttle')
+ROBOT_PROGRAMS = {prog: event_log.event_type('robot ' + prog) for prog in robot_prog_times}
 
 
 # define the Feeder class
 class Feeder(object):
-    def __init__(self):
+    def __init__(self, name):
+        self.name = name
         self.position = 'ST11'
         self.st10_nest_parts = True
         self.st11_nest_parts = True
-        self.shuttle_duration = shuttle_duration + robot_prog_times.get('pick')
+        self.shuttle_duration = scheduler.units(shuttle_duration + robot_prog_times.get('pick'))
         self.shuttle_start = 0
         self.in_cycle = False
+        self.trace = event_log.register(name)
 
     def shuttle(self, time):
         self.in_cycle = True
         self.shuttle_start = time
+        scheduler.wake_after(time, self.shuttle_duration)
+        if self.trace is not None:
+            # payload: number of the station the shuttle leaves
+            event_log.record(time, self.trace, SHUTTLE, int(self.position[2:]))
 
     def check_status(self, time):
         if self.in_cycle:
@@ -41,12 +49,8 @@ class Feeder(object):
                     self.st11_nest_parts = True
         elif self.position == 'ST10' and not self.st10_nest_parts:
             self.shuttle(time)
-            if verbose == 1:
-                print("{0:6.2f}".format(time + robot_prog_times.get('pick')), 'Shuttle start to ST11')
         elif self.position == 'ST11' and not self.st11_nest_parts:
             self.shuttle(time)
-            if verbose == 1:
-                print("{0:6.2f}".format(time + robot_prog_times.get('pick')), 'Shuttle start to ST10')
 
 
 # define the Robot class
@@ -54,6 +58,8 @@ class Robot(object):
     def __init__(self, name):
         self.name = name
         self.current_prog = None
+        # program times in clock units
+        self.prog_times = {prog: scheduler.units(duration) for prog, duration in robot_prog_times.items()}
         self.prog_time_start = 0
         self.prog_cycle_time = 0
         self.in_cycle = False
@@ -63,16 +69,20 @@ class Robot(object):
         self.location = ''
         self.start_cycle_clock = 0
         self.end_cycle_clock = 0
-        self.cycle_times = []
+        self.cycle_times = stats.StreamingStats()
+        self.trace = event_log.register(name)
 
     # Give the robot a canned task to complete
     def start_cycle(self, time, prog):
         self.current_prog = prog
         self.prog_time_start = time
-        self.prog_cycle_time = robot_prog_times.get(prog)
+        self.prog_cycle_time = self.prog_times[prog]
         self.in_cycle = True
+        scheduler.wake_after(time, self.prog_cycle_time)
         if prog == 'place':
             self.start_cycle_clock = time
+        if self.trace is not None:
+            event_log.record(time, self.trace, ROBOT_PROGRAMS[prog], 0)
 
     # Retrieve current state of robot
     def check_status(self, time):
@@ -84,7 +94,7 @@ class Robot(object):
                 self.part_inspected = True
                 self.end_cycle_clock = time
                 if self.start_cycle_clock != 0:
-                    self.cycle_times.append(self.end_cycle_clock - self.start_cycle_clock)
+                    self.cycle_times.add(scheduler.seconds(self.end_cycle_clock - self.start_cycle_clock))
             elif self.current_prog == 'place':
                 self.part_present = False
                 self.part_inspected = False
@@ -93,12 +103,26 @@ class Robot(object):
         return self.in_cycle
 
 
+# define the Controller class: one handling robot and its shuttle, working on the pallet at its bound position
+class Controller(object):
+    def __init__(self, handling, feeder):
+        self.robot = handling
+        self.feeder = feeder
+
+    def status_check(self, time):
+        status_check(time, self.robot, self.feeder)
+
+    def decision_tree(self, time, station):
+        decision_tree(time, self.robot, self.feeder, station)
+
+
 def initialize():
     # initial conditions
     st10_handling = Robot('ST10 Handling')
     st11_handling = Robot('ST11 Handling')
-    st10_11_feeder = Feeder()
-    return st10_handling, st11_handling, st10_11_feeder
+    st10_11_feeder = Feeder('ST10/11 Shuttle')
+    return {'ST10 Handling': Controller(st10_handling, st10_11_feeder),
+            'ST11 Handling': Controller(st11_handling, st10_11_feeder)}
 
 
 def status_check(time, handling, feeder):
@@ -112,21 +136,13 @@ def decision_tree(time, handling, feeder, station):
             if handling.name == 'ST10 Handling' and feeder.position == 'ST10' and feeder.st10_nest_parts:
                 handling.start_cycle(time, 'pick')
                 feeder.st10_nest_parts = False
-                if verbose == 1:
-                    print("{0:6.2f}".format(time), handling.name + ' Picking Part')
             if handling.name == 'ST11 Handling' and feeder.position == 'ST11' and feeder.st11_nest_parts:
                 handling.start_cycle(time, 'pick')
                 feeder.st11_nest_parts = False
-                if verbose == 1:
-                    print("{0:6.2f}".format(time), handling.name + ' Picking Part')
         elif not handling.part_inspected:
             handling.start_cycle(time, 'inspect')
-            if verbose == 1:
-                print("{0:6.2f}".format(time), handling.name + ' Inspecting Part')
         elif handling.part_inspected and station.current_pallet and not station.process_complete:
             handling.start_cycle(time, 'place')
-            if verbose == 1:
-                print("{0:6.2f}".format(time), handling.name + ' Placing at Pallet fixture')
 
 
 
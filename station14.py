@@ -1,4 +1,9 @@
-import random
+import math
+
+import event_log
+import scheduler
+import stats
+import streams
 
 # assumptions
 pick_prob = 0.45
@@ -8,6 +13,9 @@ feed_in_qty_max = 10
 inspect_duration = 0.25
 shuffle_duration = 1.5
 feed_in_duration = 2.0
+# accelerated feeders: draw the number of failed shuffles of a tray at once and skip the failed
+# shuffle/inspect cycles that end before any other feeder could become ready for inspection
+accelerated = False
 
 # robot program times
 robot_prog_times = {'pick left feeder': 0.88,
@@ -20,17 +28,13 @@ cameras = {'ST14a Left Feeder': 1,
            'ST14b Left Feeder': 3,
            'ST14b Right Feeder': 4}
 
-# Verbosity:
-# ______________________
-# 0: None
-# 1: All
-# 2: Robots
-# 3: STA14a Left Feeder
-# 4: STA14a Right Feeder
-# 6: STA14b Left Feeder
-# 7: STA14b Right Feeder
-# 8: Vision Controller
-verbose = 0
+# event log types
+FEEDER_INSPECT = event_log.event_type('feeder inspect')
+FEEDER_SHUFFLE = event_log.event_type('feeder shuffle')
+FEEDER_FEED_IN = event_log.event_type('feeder feed in')
+FEEDER_PICK = event_log.event_type('feeder pick')
+VISION_INSPECT = event_log.event_type('vision inspect')
+ROBOT_PROGRAMS = {prog: event_log.event_type('robot ' + prog) for prog in robot_prog_times}
 
 
 # define the Feeder class
@@ -49,56 +53,101 @@ class Feeder(object):
         self.total_qty = 0
         self.pick_qty = 0
         self.pick_prob = pick_prob
-        self.inspect_duration = inspect_duration
-        self.shuffle_duration = shuffle_duration
-        self.feedin_duration = feed_in_duration
-        self.pick_duration = robot_prog_times.get('pick left feeder')
+        # durations in clock units
+        self.inspect_duration = scheduler.units(inspect_duration)
+        self.shuffle_duration = scheduler.units(shuffle_duration)
+        self.feedin_duration = scheduler.units(feed_in_duration)
+        self.pick_duration = scheduler.units(robot_prog_times.get('pick left feeder'))
         self.inspect_start = 0
         self.shuffle_start = 0
         self.feedin_start = 0
         self.pick_start = 0
+        self.rng = streams.stream(name)
+        # shuffles of the current tray still to fail before a pick-able part shows (accelerated mode)
+        self.failed_shuffles = None
+        self.trace = event_log.register(name)
 
     # action: trigger vision inspection
     def inspect(self, time):
         self.inspect_in_cycle = True
         self.inspect_start = time
-        if (verbose == 1 or
-                (self.name == 'ST14 Left Feeder' and verbose == 3) or
-                (self.name == 'ST14 Right Feeder' and verbose == 4) or
-                (self.name == 'ST15 Left Feeder' and verbose == 6) or
-                (self.name == 'ST15 Right Feeder' and verbose == 7)):
-            print("{0:6.2f}".format(time), self.name + ' Inspecting')
+        scheduler.wake_after(time, self.inspect_duration)
+        if self.trace is not None:
+            event_log.record(time, self.trace, FEEDER_INSPECT, self.total_qty)
 
     # action: shuffle parts currently in the tray
-    def shuffle(self, time):
+    def shuffle(self, time, vision):
         self.shuffle_in_cycle = True
         self.shuffle_start = time
-        self.pick_qty = sum(random.choices([1, 0], [self.pick_prob, 1 - self.pick_prob], k=self.total_qty))
-        if (verbose == 1 or
-                (self.name == 'ST14 Left Feeder' and verbose == 3) or
-                (self.name == 'ST14 Right Feeder' and verbose == 4) or
-                (self.name == 'ST15 Left Feeder' and verbose == 6) or
-                (self.name == 'ST15 Right Feeder' and verbose == 7)):
-            print("{0:6.2f}".format(time), self.name + ' Shuffling ' + str(self.total_qty) + ' parts')
+        if accelerated:
+            self.pick_qty = self.skip_failed_shuffles(time, vision)
+        else:
+            self.pick_qty = self.rng.binomial(self.total_qty, self.pick_prob)
+        scheduler.wake_after(self.shuffle_start, self.shuffle_duration)
+        if self.trace is not None:
+            event_log.record(time, self.trace, FEEDER_SHUFFLE, self.total_qty)
+
+    # accelerated mode: start the shuffle after as many of the tray's remaining failed shuffle/inspect
+    # cycles as end before any other feeder could ask for the vision controller (step by step otherwise,
+    # so the vision controller serves the feeders in the same order in both modes), returns its pick quantity
+    def skip_failed_shuffles(self, time, vision):
+        if self.failed_shuffles is None:
+            success = 1 - (1 - self.pick_prob) ** self.total_qty
+            if success == 0:
+                return 0
+            self.failed_shuffles = self.rng.geometric(success)
+        # a skipped cycle must be over, and the vision controller released, a step before then
+        quiet_until = vision.next_request(self, time) - scheduler.step if self.failed_shuffles > 0 else 0
+        while self.failed_shuffles > 0:
+            # the time-steps at which the failed shuffle and its inspection would have completed
+            inspect_start = scheduler.first_tick_after(self.shuffle_start + self.shuffle_duration) * scheduler.step
+            cycle_end = scheduler.first_tick_after(inspect_start + self.inspect_duration) * scheduler.step
+            if cycle_end >= quiet_until or not vision.free_before(inspect_start):
+                break
+            self.shuffle_start = cycle_end
+            self.failed_shuffles -= 1
+        if self.failed_shuffles > 0:
+            self.failed_shuffles -= 1
+            return 0
+        self.failed_shuffles = None
+        return self.rng.positive_binomial(self.total_qty, self.pick_prob)
+
+    # earliest clock reading at which the feeder could be ready for inspection (a lower bound)
+    def earliest_ready(self, time):
+        if self.ready_for_inspect:
+            return time
+        if self.shuffle_in_cycle:
+            return self.shuffle_start + self.shuffle_duration
+        if self.pick_in_cycle:
+            return self.pick_start + self.pick_duration
+        if self.feedin_in_cycle:
+            return self.feedin_start + self.feedin_duration + self.shuffle_duration
+        if self.inspect_in_cycle:
+            # a pick-able part is picked next, otherwise the tray is shuffled again
+            after = self.pick_duration if self.pick_qty > 0 else self.shuffle_duration
+            return self.inspect_start + self.inspect_duration + after
+        if self.ready_for_pick:
+            return time + self.pick_duration
+        return time + min(self.pick_duration, self.shuffle_duration)
 
     # action: add more parts to the tray and shuffle
     def feed_in(self, time):
         self.feedin_in_cycle = True
         self.feedin_start = time
-        feed_qty = random.randint(self.feedin_qty_min, self.feedin_qty_max)
+        scheduler.wake_after(time, self.feedin_duration)
+        feed_qty = self.rng.randint(self.feedin_qty_min, self.feedin_qty_max)
         self.total_qty += feed_qty
-        if (verbose == 1 or
-                (self.name == 'ST14 Left Feeder' and verbose == 3) or
-                (self.name == 'ST14 Right Feeder' and verbose == 4) or
-                (self.name == 'ST15 Left Feeder' and verbose == 6) or
-                (self.name == 'ST15 Right Feeder' and verbose == 7)):
-            print("{0:6.2f}".format(time), self.name + ' Feeding in ' + str(feed_qty) + ' parts')
+        if self.trace is not None:
+            event_log.record(time, self.trace, FEEDER_FEED_IN, feed_qty)
 
     # action: remove one pick-able part from the tray
     def pick(self, time):
         self.pick_in_cycle = True
         self.ready_for_pick = False
         self.pick_start = time
+        scheduler.wake_after(time, self.pick_duration)
+        if self.trace is not None:
+            event_log.record(time, self.trace, FEEDER_PICK, self.pick_qty)
         self.pick_qty -= self.pick_qty
         self.total_qty -= self.total_qty
 
@@ -115,7 +164,7 @@ class Feeder(object):
         if self.feedin_in_cycle and (self.feedin_start + self.feedin_duration < time):
             self.feedin_in_cycle = False
             self.feedin_start = 0
-            self.shuffle(time)
+            self.shuffle(time, vision)
         if self.pick_in_cycle and (self.pick_start + self.pick_duration < time):
             self.pick_in_cycle = False
             self.pick_start = 0
@@ -137,7 +186,7 @@ class Feeder(object):
                 elif self.total_qty < self.total_qty_min:
                     self.feed_in(time)
                 else:
-                    self.shuffle(time)
+                    self.shuffle(time, vision)
 
 
 # define the Robot class
@@ -145,6 +194,8 @@ class Robot(object):
     def __init__(self, name):
         self.name = name
         self.current_prog = None
+        # program times in clock units
+        self.prog_times = {prog: scheduler.units(duration) for prog, duration in robot_prog_times.items()}
         self.prog_time_start = 0
         self.prog_cycle_time = 0
         self.in_cycle = False
@@ -153,16 +204,20 @@ class Robot(object):
         self.location = ''
         self.start_cycle_clock = 0
         self.end_cycle_clock = 0
-        self.cycle_times = []
+        self.cycle_times = stats.StreamingStats()
+        self.trace = event_log.register(name)
 
     # Give the robot a canned task to complete
     def start_cycle(self, time, prog):
         self.current_prog = prog
         self.prog_time_start = time
-        self.prog_cycle_time = robot_prog_times.get(prog)
+        self.prog_cycle_time = self.prog_times[prog]
         self.in_cycle = True
+        scheduler.wake_after(time, self.prog_cycle_time)
         if prog == 'place at pallet':
             self.start_cycle_clock = time
+        if self.trace is not None:
+            event_log.record(time, self.trace, ROBOT_PROGRAMS[prog], 0)
 
     # Retrieve current state of robot
     def check_status(self, time):
@@ -172,7 +227,7 @@ class Robot(object):
                 self.part_present = True
                 self.end_cycle_clock = time
                 if self.start_cycle_clock != 0:
-                    self.cycle_times.append(self.end_cycle_clock - self.start_cycle_clock)
+                    self.cycle_times.add(scheduler.seconds(self.end_cycle_clock - self.start_cycle_clock))
             elif self.current_prog == 'place at pallet':
                 self.part_present = False
                 self.process_complete = True
@@ -182,19 +237,33 @@ class Robot(object):
 
 # define the Vision Controller class
 class VisionController(object):
-    def __init__(self):
+    def __init__(self, name, feeders):
+        self.name = name
+        self.feeders = feeders
         self.in_cycle = False
         self.active_camera = 0
         self.inspect_start = 0
-        self.inspect_duration = inspect_duration
+        self.inspect_duration = scheduler.units(inspect_duration)
+        self.trace = event_log.register(name)
+
+    # earliest clock reading at which a feeder other than the given one could ask for an inspection
+    def next_request(self, feeder, time):
+        return min((other.earliest_ready(time) for other in self.feeders if other is not feeder), default=math.inf)
+
+    # is the controller released (or free) at a time-step before the given clock reading
+    def free_before(self, time):
+        if not self.in_cycle:
+            return True
+        return scheduler.first_tick_after(self.inspect_start + self.inspect_duration) * scheduler.step < time
 
     # action: run inspection program on a single camera
     def start_inspection(self, time, camera):
         self.in_cycle = True
         self.active_camera = camera
         self.inspect_start = time
-        if verbose == 1 or verbose == 8:
-            print("{0:6.2f}".format(time), 'Inspecting with Camera ' + str(camera))
+        scheduler.wake_after(time, self.inspect_duration)
+        if self.trace is not None:
+            event_log.record(time, self.trace, VISION_INSPECT, camera)
 
     # retrieve current status of the Vision Controller
     def check_status(self, time):
@@ -204,16 +273,32 @@ class VisionController(object):
             self.active_camera = 0
 
 
+# define the Controller class: one robot with its two feeders, working on the pallet at its bound position
+class Controller(object):
+    def __init__(self, l_feed, r_feed, robot, vision):
+        self.l_feed = l_feed
+        self.r_feed = r_feed
+        self.robot = robot
+        self.vision = vision
+
+    def status_check(self, time):
+        status_check(time, self.l_feed, self.r_feed, self.robot, self.vision)
+
+    def decision_tree(self, time, station):
+        decision_tree(time, self.l_feed, self.r_feed, self.robot, station)
+
+
 def initialize():
     # initial conditions
     l_feed_14a = Feeder('ST14a Left Feeder')
     r_feed_14a = Feeder('ST14a Right Feeder')
     l_feed_14b = Feeder('ST14b Left Feeder')
     r_feed_14b = Feeder('ST14b Right Feeder')
-    vision = VisionController()
+    vision = VisionController('ST14/15 Vision Controller', [l_feed_14a, r_feed_14a, l_feed_14b, r_feed_14b])
     robot_14a = Robot('ST14a Robot')
     robot_14b = Robot('ST14b Robot')
-    return l_feed_14a, r_feed_14a, robot_14a, l_feed_14b, r_feed_14b, robot_14b, vision
+    return {'ST14 Robot': Controller(l_feed_14a, r_feed_14a, robot_14a, vision),
+            'ST15 Robot': Controller(l_feed_14b, r_feed_14b, robot_14b, vision)}
 
 
 def status_check(time, l_feed, r_feed, robot, vision):
@@ -230,15 +315,9 @@ def decision_tree(time, l_feed, r_feed, robot, station):
             if l_feed.ready_for_pick:
                 robot.start_cycle(time, 'pick left feeder')
                 l_feed.pick(time)
-                if verbose == 1 or verbose == 2:
-                    print("{0:6.2f}".format(time), robot.name + ' Picking from Left Feeder')
             elif r_feed.ready_for_pick:
                 robot.start_cycle(time, 'pick right feeder')
                 r_feed.pick(time)
-                if verbose == 1 or verbose == 2:
-                    print("{0:6.2f}".format(time), robot.name + ' Picking from Right Feeder')
         else:
             if station.current_pallet and not station.process_complete:
                 robot.start_cycle(time, 'place at pallet')
-                if verbose == 1 or verbose == 2:
-                    print("{0:6.2f}".format(time), robot.name + ' Placed at Pallet fixture')
@@ -0,0 +1,103 @@
+import math
+
+# quantiles estimated by every accumulator
+quantiles = (0.5, 0.95, 0.99)
+# also keep every raw sample (memory grows with run length)
+keep_samples = False
+
+
+# P-squared estimate of a single quantile (Jain & Chlamtac), five markers regardless of sample count
+class P2Quantile(object):
+    def __init__(self, p):
+        self.p = p
+        self.heights = []
+        self.positions = [1, 2, 3, 4, 5]
+        self.desired = [1, 1 + 2 * p, 1 + 4 * p, 3 + 2 * p, 5]
+        self.increments = [0, p / 2, p, (1 + p) / 2, 1]
+
+    def add(self, value):
+        q = self.heights
+        n = self.positions
+        if len(q) < 5:
+            q.append(value)
+            q.sort()
+            return
+
+        # find the cell the new value falls in, stretching the extreme markers if needed
+        if value < q[0]:
+            q[0] = value
+            k = 0
+        elif value >= q[4]:
+            q[4] = value
+            k = 3
+        else:
+            k = 0
+            while value >= q[k + 1]:
+                k += 1
+        for i in range(k + 1, 5):
+            n[i] += 1
+        for i in range(5):
+            self.desired[i] += self.increments[i]
+
+        # move the middle markers towards their desired positions
+        for i in range(1, 4):
+            d = self.desired[i] - n[i]
+            if (d >= 1 and n[i + 1] - n[i] > 1) or (d <= -1 and n[i - 1] - n[i] < -1):
+                d = 1 if d > 0 else -1
+                height = q[i] + d / (n[i + 1] - n[i - 1]) * (
+                    (n[i] - n[i - 1] + d) * (q[i + 1] - q[i]) / (n[i + 1] - n[i]) +
+                    (n[i + 1] - n[i] - d) * (q[i] - q[i - 1]) / (n[i] - n[i - 1]))
+                if not q[i - 1] < height < q[i + 1]:
+                    height = q[i] + d * (q[i + d] - q[i]) / (n[i + d] - n[i])
+                q[i] = height
+                n[i] += d
+
+    def value(self):
+        if not self.heights:
+            return math.nan
+        if len(self.heights) < 5:
+            return self.heights[int(round(self.p * (len(self.heights) - 1)))]
+        return self.heights[2]
+
+
+# constant-memory count, mean, variance (Welford), min/max and quantile estimates of a stream of samples;
+# mean, min, max and quantiles are nan until the first sample
+class StreamingStats(object):
+    def __init__(self, keep=None):
+        self.count = 0
+        self.mean = math.nan
+        self.m2 = 0.0
+        self.min = math.nan
+        self.max = math.nan
+        self.quantiles = [P2Quantile(p) for p in quantiles]
+        self.samples = [] if (keep_samples if keep is None else keep) else None
+
+    def add(self, value):
+        self.count += 1
+        if self.count == 1:
+            self.mean = self.min = self.max = value
+        else:
+            delta = value - self.mean
+            self.mean += delta / self.count
+            self.m2 += delta * (value - self.mean)
+            if value < self.min:
+                self.min = value
+            if value > self.max:
+                self.max = value
+        for quantile in self.quantiles:
+            quantile.add(value)
+        if self.samples is not None:
+            self.samples.append(value)
+
+    def variance(self):
+        return self.m2 / (self.count - 1) if self.count > 1 else 0.0
+
+    def stdev(self):
+        return math.sqrt(self.variance())
+
+    # estimate of quantile p, which must be one of the tracked quantiles
+    def quantile(self, p):
+        for quantile in self.quantiles:
+            if quantile.p == p:
+                return quantile.value()
+        raise ValueError('quantile ' + str(p) + ' is not tracked')
@@ -0,0 +1,129 @@
+import math
+import statistics
+
+import event_log
+import pallet_track
+import replications
+
+# stop once the takt confidence interval half-width is within this fraction of the mean
+precision = 0.002
+# confidence level of the batch-means interval
+confidence = 0.95
+# number of batches the steady-state takt series is split into
+batch_count = 20
+# smallest batch (in takt samples) the interval is computed from
+min_batch_size = 10
+# simulated time (in seconds) between precision checks
+check_interval = 600
+# longest run (in hours) if the precision is never reached
+max_runtime = 8
+# seed of the run (None: seed from system entropy)
+seed = 1
+
+# samples per MSER-5 batch (fixed by the method, not a parameter)
+MSER_BATCH = 5
+
+
+# the takt series as it arrives, reduced to the mean and max of every full batch of 5 samples: all that
+# MSER-5 and batch means need, so memory grows five times slower than with every sample kept
+class TaktBatches(object):
+    def __init__(self):
+        self.means = []
+        self.maxima = []
+        self.total = 0.0
+        self.max = -math.inf
+        self.count = 0
+
+    def add(self, value):
+        self.total += value
+        self.max = max(self.max, value)
+        self.count += 1
+        if self.count == MSER_BATCH:
+            self.means.append(self.total / MSER_BATCH)
+            self.maxima.append(self.max)
+            self.total, self.max, self.count = 0.0, -math.inf, 0
+
+
+# MSER-5 truncation point in batches of 5: the number of leading batch means to delete so that the mean of
+# the remaining ones has the smallest standard error, searched over the first half of the series
+# (None while the series has fewer than 10 batches)
+def mser5(means):
+    count = len(means)
+    if count < 10:
+        return None
+    # suffix sums of the batch means and of their squares
+    total, squares = 0.0, 0.0
+    best, best_d = math.inf, 0
+    for d in range(count - 1, -1, -1):
+        total += means[d]
+        squares += means[d] ** 2
+        remaining = count - d
+        mser = (squares - total ** 2 / remaining) / remaining ** 2
+        if d <= count // 2 and mser <= best:
+            best, best_d = mser, d
+    return best_d
+
+
+# batch-means mean, confidence interval and batch layout (batch size in takt samples) of a steady-state
+# series given as batch-of-5 means, None if it is too short for batch_count batches of min_batch_size
+def batch_means(means, conf=confidence, batches=batch_count):
+    size = len(means) // batches
+    if size * MSER_BATCH < min_batch_size:
+        return None
+    # drop the oldest batches of 5 that do not fill a batch
+    start = len(means) - size * batches
+    batch = [sum(means[start + i * size:start + (i + 1) * size]) / size for i in range(batches)]
+    mean = sum(batch) / batches
+    half_width = replications.t_critical(conf, batches - 1) * statistics.stdev(batch) / math.sqrt(batches)
+    return {'mean': mean,
+            'ci': (mean - half_width, mean + half_width),
+            'half_width': half_width,
+            'batches': batches,
+            'batch_size': size * MSER_BATCH}
+
+
+# run one replication until the steady-state takt is known to the requested relative precision
+def run_simulation(run_seed=seed, target=precision, conf=confidence):
+    sim = pallet_track.start_simulation(run_seed)
+    takt = pallet_track.unload_cycle_times = TaktBatches()
+    end_time = 0
+    result, truncation = None, None
+    while end_time < max_runtime * 3600:
+        end_time = min(end_time + check_interval, max_runtime * 3600)
+        pallet_track.advance(sim, end_time)
+        truncation = mser5(takt.means)
+        if truncation is None:
+            continue
+        result = batch_means(takt.means[truncation:], conf)
+        if result is not None and result['half_width'] <= target * result['mean']:
+            break
+    event_log.close()
+    if result is None:
+        raise ValueError('no steady state detected within ' + str(max_runtime) + ' hours')
+    result['precision'] = result['half_width'] / result['mean']
+    result['warmup_samples'] = truncation * MSER_BATCH
+    result['warmup_time'] = sum(takt.means[:truncation]) * MSER_BATCH
+    result['runtime'] = end_time
+    result['max'] = max(takt.maxima[truncation:])
+    return result
+
+
+def print_summary(result, conf=confidence):
+    print('')
+    print('Warm-up: ' + str(result['warmup_samples']) + ' takt samples (' +
+          str(round(result['warmup_time'], 1)) + ' s) truncated by MSER-5')
+    print('Stopped after ' + str(round(result['runtime'] / 3600, 3)) + ' hours with ' +
+          str(result['batches']) + ' batches of ' + str(result['batch_size']) + ' takt samples')
+    print('Overall takt time mean [' + str(round(conf * 100)) + '% CI] / max: ' +
+          str(round(result['mean'], 3)) +
+          ' [' + str(round(result['ci'][0], 3)) + ', ' + str(round(result['ci'][1], 3)) + ']' +
+          ' / ' +
+          str(round(result['max'], 3)) +
+          '  (relative half-width ' + str(round(result['precision'], 5)) + ')')
+
+
+if __name__ == '__main__':
+    print('Simulation Running until the takt is within ' + str(precision * 100) + '%...')
+    print_summary(run_simulation())
+    print('')
+    print('Simulation Complete!')
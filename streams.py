@@ -0,0 +1,139 @@
+import bisect
+import hashlib
+import math
+import random
+
+# Every random component draws from its own stream, seeded from the master seed and the component's
+# name. A change in event ordering or an added component therefore leaves every other component's
+# draws untouched, and two configurations run with the same master seed see common random numbers.
+
+# master seed of the current run
+master_seed = None
+# hand out antithetic streams: every uniform draw u becomes 1 - u
+antithetic = False
+# uniforms generated at a time when a stream's block runs out
+block_size = 1024
+
+# cumulative binomial probabilities by (n, p), shared by all streams
+binomial_cdfs = {}
+# NumPy, imported by the first draw so processes that never draw skip its import
+# (False: not installed, blocks are then filled by the Python generator)
+np = None
+
+
+# the NumPy module (False if it is not installed), imported on first use
+def load_numpy():
+    global np
+    if np is None:
+        try:
+            import numpy
+            np = numpy
+        except ImportError:
+            np = False
+    return np
+
+
+# a component's random stream: uniforms are generated in NumPy blocks and consumed one by one, and
+# every variate is drawn by inversion so antithetic streams mirror them too
+class Stream(object):
+    def __init__(self, seed):
+        self.digest = hashlib.sha256(seed.encode()).digest()
+        # built by the first draw (None until then), so a stream that is never drawn from imports nothing
+        self.generator = None
+        self.block = []
+        self.index = 0
+        self.block_state = None
+
+    def refill(self):
+        if self.generator is None:
+            if load_numpy():
+                self.generator = np.random.default_rng(int.from_bytes(self.digest, 'little'))
+            else:
+                self.generator = random.Random(self.digest)
+        # the generator state the block was made from, so snapshots can rebuild it instead of storing it
+        self.block_state = self.generator_state()
+        if np:
+            self.block = self.generator.random(block_size).tolist()
+        else:
+            self.block = [self.generator.random() for _ in range(block_size)]
+        self.index = 0
+
+    def generator_state(self):
+        return self.generator.bit_generator.state if load_numpy() else self.generator.getstate()
+
+    def __getstate__(self):
+        state = dict(self.__dict__)
+        del state['block']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.block = []
+        if self.block_state is not None:
+            if load_numpy():
+                self.generator.bit_generator.state = self.block_state
+            else:
+                self.generator.setstate(self.block_state)
+            index = self.index
+            self.refill()
+            self.index = index
+
+    def random(self):
+        if self.index == len(self.block):
+            self.refill()
+        u = self.block[self.index]
+        self.index += 1
+        return u
+
+    # integer uniformly distributed in [a, b]
+    def randint(self, a, b):
+        return min(a + int((b - a + 1) * self.random()), b)
+
+    # number of successes in n trials of probability p
+    def binomial(self, n, p):
+        cdf = binomial_cdfs.get((n, p))
+        if cdf is None:
+            cdf = binomial_cdfs[(n, p)] = binomial_cdf(n, p)
+        return bisect.bisect_right(cdf, self.random())
+
+    # binomial(n, p) variate conditioned on at least one success
+    def positive_binomial(self, n, p):
+        cdf = binomial_cdfs.get((n, p))
+        if cdf is None:
+            cdf = binomial_cdfs[(n, p)] = binomial_cdf(n, p)
+        return bisect.bisect_right(cdf, cdf[0] + (1.0 - cdf[0]) * self.random())
+
+    # number of failures before the first success of trials with success probability q
+    def geometric(self, q):
+        if q >= 1:
+            return 0
+        return int(math.log(1.0 - self.random()) / math.log(1.0 - q))
+
+
+# the mirror image of a Stream with the same seed
+class AntitheticStream(Stream):
+    def refill(self):
+        super(AntitheticStream, self).refill()
+        self.block = [1.0 - u for u in self.block]
+
+
+# P(X <= k) of a binomial(n, p) variate for k = 0..n-1 (a uniform above all of them draws n)
+def binomial_cdf(n, p):
+    cdf, total = [], 0.0
+    for k in range(n):
+        total += math.comb(n, k) * p ** k * (1 - p) ** (n - k)
+        cdf.append(total)
+    return cdf
+
+
+# start a run's streams from a master seed (None: seed from system entropy)
+def reset(seed=None, mirror=False):
+    global master_seed, antithetic
+    master_seed = random.SystemRandom().getrandbits(64) if seed is None else seed
+    antithetic = mirror
+
+
+# the stream of the named component in the current run
+def stream(name):
+    seed = str(master_seed) + '/' + name
+    return AntitheticStream(seed) if antithetic else Stream(seed)
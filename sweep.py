@@ -0,0 +1,204 @@
+import csv
+import itertools
+import random
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+import pallet_track
+import replications
+import station2_3
+import station8_9
+import station10_11
+import station14
+
+# Parameters are named 'module.attribute', with '[key]' for a dict entry and, for pallet_positions,
+# '.transit_time' or '.cycle_time' for a field of the position tuple, e.g.
+#   'station2_3.pick_prob'
+#   'station14.robot_prog_times[place at pallet]'
+#   'pallet_track.pallet_positions[16].transit_time'
+
+# design: 'grid' (levels below), 'random' or 'latin hypercube' (ranges below)
+design = 'latin hypercube'
+# levels of each parameter for a grid design
+levels = {'station2_3.pick_prob': [0.35, 0.45, 0.55],
+          'pallet_track.pallet_count': [16, 18, 20]}
+# (low, high) of each parameter for random and latin hypercube designs
+ranges = {'station2_3.pick_prob': (0.3, 0.6),
+          'station14.pick_prob': (0.3, 0.6),
+          'station2_3.shuffle_duration': (1.0, 2.0),
+          'pallet_track.pallet_count': (14, 20)}
+# number of design points for random and latin hypercube designs
+points = 20
+# seed for drawing the design points and for every simulation run
+seed = 1
+# worker processes (None: one per core)
+workers = None
+# where to write the result table (None: print only)
+output_file = 'sweep_results.csv'
+
+modules = {'pallet_track': pallet_track,
+           'station2_3': station2_3,
+           'station8_9': station8_9,
+           'station10_11': station10_11,
+           'station14': station14}
+# fields of a pallet_positions entry
+position_fields = {'transit_time': 1, 'cycle_time': 2}
+# parameters that count something, rounded to the nearest integer when a design point sets them
+integer_parameters = ('pallet_track.pallet_count',
+                      'station2_3.total_qty_min', 'station2_3.feed_in_qty_min', 'station2_3.feed_in_qty_max',
+                      'station14.total_qty_min', 'station14.feed_in_qty_min', 'station14.feed_in_qty_max')
+
+
+# split a parameter name into (module, attribute, key, field)
+def parse_parameter(name):
+    module_name, _, rest = name.partition('.')
+    if module_name not in modules:
+        raise ValueError('unknown module in parameter ' + repr(name))
+    attribute, key, field = rest, None, None
+    if '[' in rest:
+        attribute, _, rest = rest.partition('[')
+        key, _, field = rest.partition(']')
+        field = field.lstrip('.') or None
+        if attribute == 'pallet_positions':
+            key = int(key)
+    module = modules[module_name]
+    if not hasattr(module, attribute):
+        raise ValueError('unknown attribute in parameter ' + repr(name))
+    if key is not None and key not in getattr(module, attribute):
+        raise ValueError('unknown key in parameter ' + repr(name))
+    if field is not None and field not in position_fields:
+        raise ValueError('unknown field in parameter ' + repr(name))
+    return module, attribute, key, field
+
+
+# current value of a parameter
+def parameter_value(name):
+    module, attribute, key, field = parse_parameter(name)
+    value = getattr(module, attribute)
+    if key is not None:
+        value = value[key]
+    if field is not None:
+        value = value[position_fields[field]]
+    return value
+
+
+# set the design point's parameters, returns what is needed to restore the previous values;
+# dicts are replaced by modified copies so the originals are never mutated
+def apply_parameters(point):
+    saved = []
+    for name, value in point.items():
+        module, attribute, key, field = parse_parameter(name)
+        original = getattr(module, attribute)
+        saved.append((module, attribute, original))
+        if name in integer_parameters:
+            value = int(round(value))
+        if key is None:
+            setattr(module, attribute, value)
+            continue
+        updated = dict(original)
+        if field is None:
+            updated[key] = value
+        else:
+            entry = list(updated[key])
+            entry[position_fields[field]] = value
+            updated[key] = tuple(entry)
+        setattr(module, attribute, updated)
+    return saved
+
+
+# undo apply_parameters, latest change first so repeated attributes end up at their original value
+def restore_parameters(saved):
+    for module, attribute, original in reversed(saved):
+        setattr(module, attribute, original)
+
+
+# every combination of the given levels
+def grid_design(parameter_levels):
+    names = list(parameter_levels)
+    return [dict(zip(names, values)) for values in itertools.product(*parameter_levels.values())]
+
+
+# count points drawn uniformly within the given ranges
+def random_design(parameter_ranges, count, design_seed=seed):
+    rng = random.Random(design_seed)
+    return [{name: rng.uniform(low, high) for name, (low, high) in parameter_ranges.items()}
+            for _ in range(count)]
+
+
+# count points with each parameter's range cut into count strata, every stratum used exactly once
+def latin_hypercube_design(parameter_ranges, count, design_seed=seed):
+    rng = random.Random(design_seed)
+    columns = {}
+    for name, (low, high) in parameter_ranges.items():
+        strata = list(range(count))
+        rng.shuffle(strata)
+        columns[name] = [low + (high - low) * (stratum + rng.random()) / count for stratum in strata]
+    return [{name: columns[name][i] for name in parameter_ranges} for i in range(count)]
+
+
+# run one design point with its parameters applied, returns one result table row
+def run_point(point, run_seed=seed):
+    saved = apply_parameters(point)
+    try:
+        # record the values actually simulated, e.g. integer parameters after rounding
+        row = {name: parameter_value(name) for name in point}
+        outputs = replications.run_replication(run_seed)
+    finally:
+        restore_parameters(saved)
+    for name, (mean, maximum) in outputs.items():
+        row[name + ' mean'] = mean
+        row[name + ' max'] = maximum
+    return row
+
+
+# run every design point across a process pool, every point with the same seed
+def run_sweep(design_points, run_seed=seed, max_workers=workers):
+    with ProcessPoolExecutor(max_workers=max_workers, initializer=replications.quiet_worker) as pool:
+        return list(pool.map(run_point, design_points, itertools.repeat(run_seed)))
+
+
+# a parameter value for printing: numbers rounded, anything else (e.g. a line_file) as it is
+def format_value(value):
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return str(round(value, 3))
+    return str(value)
+
+
+# write the result rows as CSV, to a file or stdout
+def write_table(rows, path=None):
+    out = open(path, 'w', newline='') if path else sys.stdout
+    try:
+        # rows of different designs may name different parameters
+        fieldnames = list(dict.fromkeys(name for row in rows for name in row))
+        writer = csv.DictWriter(out, fieldnames=fieldnames)
+        writer.writeheader()
+        writer.writerows(rows)
+    finally:
+        if path:
+            out.close()
+
+
+# the design points of the configured design
+def design_points():
+    if design == 'grid':
+        return grid_design(levels)
+    if design == 'random':
+        return random_design(ranges, points, seed)
+    return latin_hypercube_design(ranges, points, seed)
+
+
+# sweep the configured design, every point on top of the fixed parameters, and write the result table
+def main(fixed=None):
+    sweep_points = design_points()
+    print('Sweeping', len(sweep_points), 'design points...')
+    results = run_sweep([dict(fixed or {}, **point) for point in sweep_points], seed, workers)
+    write_table(results, output_file)
+    for result in results:
+        print(', '.join(name + '=' + format_value(result[name]) for name in sweep_points[0]) +
+              ' -> takt ' + str(round(result['Overall mean'], 3)))
+    print('')
+    print('Sweep Complete!')
+
+
+if __name__ == '__main__':
+    main()
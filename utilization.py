@@ -0,0 +1,166 @@
+import array
+import csv
+import sys
+
+# Every pallet position and station robot is in one of four states at any time:
+#   busy     a position holds a pallet that is being processed, a robot runs a program
+#   blocked  a position holds a finished pallet the downstream position cannot take yet, a robot has
+#            finished (or holds the next part) while the pallet it worked on waits to be released
+#   starved  a position is empty with no pallet on its way, a robot waits for a part or a pallet
+#   transit  a pallet is on its way to the position, a robot holds a part for that pallet
+# The time spent in each state is added up in fixed-width time bins held in preallocated arrays. When a
+# run outlasts them, neighbouring bins are merged and the width doubles, so memory stays the same for
+# any run length.
+
+# record the states during runs (cli.py run --utilization sets it for one run)
+enabled = False
+# width of a time bin (in seconds) before any merging
+bin_width = 60
+# number of time bins (even, so pairs can be merged)
+bin_count = 480
+# where the time series are written with the reports (see pallet_track.print_reports, None: not written)
+output_file = 'utilization.csv'
+# plot the busy fraction of every robot over time with the reports
+plot = True
+
+BUSY = 0
+BLOCKED = 1
+STARVED = 2
+TRANSIT = 3
+state_names = ('busy', 'blocked', 'starved', 'transit')
+
+# the recorder of the most recently finished run
+recorded = None
+
+
+# the state of a pallet stop
+def position_state(stop):
+    if stop.current_pallet:
+        return BLOCKED if stop.process_complete else BUSY
+    return TRANSIT if stop.inbound else STARVED
+
+
+# the state of a robot working on the given stop
+def robot_state(robot, stop):
+    if robot.in_cycle:
+        return BUSY
+    if robot.process_complete or (robot.part_present and stop.process_complete):
+        return BLOCKED
+    if robot.part_present and not stop.current_pallet and stop.inbound:
+        return TRANSIT
+    return STARVED
+
+
+# clock units each tracked position and robot spent in each state, per time bin
+class Recorder(object):
+    def __init__(self, names, kinds, width, count=None):
+        count = count or bin_count
+        if count % 2:
+            raise ValueError('bin_count must be even, not ' + str(count))
+        self.names = names
+        self.kinds = kinds
+        # bin width in clock units
+        self.width = width
+        self.count = count
+        self.totals = array.array('d', bytes(8 * len(names) * len(state_names) * count))
+        self.states = [None] * len(names)
+        self.since = [0] * len(names)
+        self.end = 0
+
+    # the entity is in the given state from time on
+    def set(self, entity, time, state):
+        previous = self.states[entity]
+        if state != previous:
+            if previous is not None:
+                self.add(entity, previous, self.since[entity], time)
+            self.states[entity] = state
+            self.since[entity] = time
+
+    # add the interval [start, end) to the bins of an entity's state
+    def add(self, entity, state, start, end):
+        while end > self.width * self.count:
+            self.merge()
+        base = (entity * len(state_names) + state) * self.count
+        index = start // self.width
+        while start < end:
+            stop = min(end, (index + 1) * self.width)
+            self.totals[base + index] += stop - start
+            start = stop
+            index += 1
+
+    # merge neighbouring bins of every series, doubling the width
+    def merge(self):
+        half = self.count // 2
+        for base in range(0, len(self.totals), self.count):
+            for index in range(half):
+                self.totals[base + index] = self.totals[base + 2 * index] + self.totals[base + 2 * index + 1]
+            for index in range(half, self.count):
+                self.totals[base + index] = 0.0
+        self.width *= 2
+
+    # close the open intervals at the end of the run
+    def finish(self, time):
+        for entity, state in enumerate(self.states):
+            if state is not None:
+                self.add(entity, state, self.since[entity], time)
+                self.since[entity] = time
+        self.end = time
+
+    # number of bins up to the end of the run
+    def used_bins(self):
+        return min(-(-self.end // self.width), self.count)
+
+    # clock units of the given entity in each state, per bin up to the end of the run
+    def series(self, entity):
+        used = self.used_bins()
+        return {name: self.totals[(entity * len(state_names) + state) * self.count:][:used]
+                for state, name in enumerate(state_names)}
+
+    # fraction of the run each entity spent in each state
+    def fractions(self):
+        result = {}
+        for entity, name in enumerate(self.names):
+            result[name] = {state: sum(values) / self.end if self.end else 0.0
+                            for state, values in self.series(entity).items()}
+        return result
+
+
+# export the recorder as one CSV row per bin and entity, bin bounds and state times in seconds
+def write_table(recorder, resolution, path=None):
+    out = open(path, 'w', newline='') if path else sys.stdout
+    try:
+        writer = csv.writer(out)
+        writer.writerow(['start', 'end', 'name', 'kind'] + list(state_names))
+        for entity, name in enumerate(recorder.names):
+            series = recorder.series(entity)
+            for index in range(recorder.used_bins()):
+                start = index * recorder.width
+                end = min(start + recorder.width, recorder.end)
+                writer.writerow([start / resolution, end / resolution, name, recorder.kinds[entity]] +
+                                [series[state][index] / resolution for state in state_names])
+    finally:
+        if path:
+            out.close()
+
+
+# busy fraction of every robot per bin
+def plot_robots(recorder, resolution):
+    import matplotlib.pyplot as plt
+
+    for entity, name in enumerate(recorder.names):
+        if recorder.kinds[entity] == 'robot':
+            busy = recorder.series(entity)['busy']
+            plt.plot([(index + 0.5) * recorder.width / resolution / 3600 for index in range(len(busy))],
+                     [value / recorder.width for value in busy], label=name)
+    plt.xlabel('hours')
+    plt.ylabel('busy fraction')
+    plt.legend()
+    plt.show()
+
+
+# share of the run each position and robot spent in each state
+def print_fractions(recorder):
+    print('')
+    print('{0:<26}'.format('') + ''.join('{0:>10}'.format(state) for state in state_names))
+    for name, fractions in recorder.fractions().items():
+        print('{0:<26}'.format(name) + ''.join('{0:>9.1f}%'.format(fractions[state] * 100) for state in state_names))
@@ -0,0 +1,421 @@
+import numpy as np
+
+import pallet_track
+import replications
+import scheduler
+
+# number of replications advanced in lock-step
+replications_count = 1000
+# seed of the shared generator (None: seed from system entropy)
+seed = 1
+
+# Every component group below holds one row per replication and one column per component, so a
+# single array operation advances that component type in all replications at once. Timed actions
+# store their end time (start + duration in integer clock units, as the object model compares them).
+
+# feeder activities (a feeder only ever runs one at a time)
+INSPECT = 1
+SHUFFLE = 2
+FEED_IN = 3
+PICK = 4
+
+# robot program codes, vision station robots / handling robots
+PICK_LEFT = 0
+PICK_RIGHT = 1
+PLACE_AT_PALLET = 2
+HANDLING_PICK = 0
+HANDLING_INSPECT = 1
+HANDLING_PLACE = 2
+
+
+# durations in seconds as an integer array of clock units
+def units(seconds):
+    return np.rint(np.array(seconds) * scheduler.resolution).astype(np.int64)
+
+
+# running count/sum/max of a set of cycle-time outputs
+class CycleTimes(object):
+    def __init__(self, shape):
+        self.count = np.zeros(shape, np.int64)
+        self.total = np.zeros(shape)
+        self.max = np.zeros(shape)
+
+    # values in clock units, recorded in seconds
+    def record(self, mask, values):
+        values = np.where(mask, values / scheduler.resolution, 0.0)
+        self.count += mask
+        self.total += values
+        np.maximum(self.max, values, out=self.max)
+
+    # per-replication (mean, max) pairs of one column, the same reduction replications.run_replication uses
+    # ((nan, nan) where the replication recorded no value)
+    def samples(self, column=Ellipsis):
+        recorded = self.count[:, column] > 0
+        mean = np.where(recorded, self.total[:, column] / np.maximum(self.count[:, column], 1), np.nan)
+        maximum = np.where(recorded, self.max[:, column], np.nan)
+        return list(zip(mean.tolist(), maximum.tolist()))
+
+
+# PalletStop and Pallet state: one column per pallet position, pallets are tracked by the stop they
+# occupy or travel towards
+class PalletStops(object):
+    def __init__(self, count, line):
+        size = len(line.successor) - 1
+        self.upstream_transit_time = units(line.transit_time[1:])
+        self.cycle_time = units(line.cycle_time[1:])
+        self.clearing_time = scheduler.units(pallet_track.pallet_clearing_time)
+        self.takt_column = line.takt_position - 1
+        # stops whose process is completed by a robot rather than by a fixed cycle time
+        self.timed = np.ones(size, bool)
+        self.occupied = np.zeros((count, size), bool)
+        self.occupied[:, :pallet_track.pallet_count] = True
+        self.occupied_at_check = self.occupied.copy()
+        self.process_complete = np.zeros((count, size), bool)
+        # last time-step each stop was seen empty (pallet arrival) / occupied (pallet release)
+        self.last_empty = np.full((count, size), -scheduler.step, np.int64)
+        self.last_occupied = np.full((count, size), -scheduler.step, np.int64)
+        # a stop only ever has one pallet travelling towards it: the clearing time keeps the upstream
+        # stop from releasing again before the pallet already in transit has arrived
+        self.in_transit = np.zeros((count, size), bool)
+        self.transit_end = np.zeros((count, size), np.int64)
+        self.cycle_clock = np.zeros(count, np.int64)
+        self.prev_cycle_clock = np.zeros(count, np.int64)
+        self.takt = CycleTimes(count)
+
+    # PalletStop.check_status followed by Pallet.check_status
+    def check_status(self, time):
+        np.copyto(self.occupied_at_check, self.occupied)
+        arrived = self.in_transit & (self.transit_end < time)
+        if arrived.any():
+            self.in_transit &= ~arrived
+            self.occupied |= arrived
+            np.copyto(self.last_empty, time, where=arrived)
+
+    # the fixed cycle time and release part of pallet_decision_tree, after robots handed over completion
+    def decision_tree(self, time):
+        complete = (self.occupied_at_check & ~self.process_complete & self.timed &
+                    (time - self.last_empty > self.cycle_time))
+        self.process_complete |= complete
+        self.unload(complete[:, self.takt_column], time)
+        clear = ~self.occupied_at_check & (time - self.last_occupied > self.clearing_time)
+        release = self.process_complete & np.roll(clear, -1, axis=1)
+        if release.any():
+            self.occupied &= ~release
+            self.process_complete &= ~release
+            np.copyto(self.last_occupied, time, where=release)
+            arriving = np.roll(release, 1, axis=1)
+            self.in_transit |= arriving
+            np.copyto(self.transit_end, time + self.upstream_transit_time, where=arriving)
+
+    # the takt position completed at time in the replications of the mask
+    def unload(self, unloaded, time):
+        if unloaded.any():
+            self.prev_cycle_clock = np.where(unloaded, self.cycle_clock, self.prev_cycle_clock)
+            self.cycle_clock = np.where(unloaded, time, self.cycle_clock)
+
+    # the unload cycle bookkeeping at the end of each run_simulation step
+    def record_takt(self):
+        unloaded = (self.prev_cycle_clock != self.cycle_clock) & (self.prev_cycle_clock != 0)
+        if unloaded.any():
+            self.takt.record(unloaded, self.cycle_clock - self.prev_cycle_clock)
+            self.prev_cycle_clock = np.where(unloaded, self.cycle_clock, self.prev_cycle_clock)
+
+
+# station2_3 / station14 VisionController, one column per vision station
+class VisionControllers(object):
+    def __init__(self, count):
+        self.inspect_duration = units([station.inspect_duration for station, names in pallet_track.vision_stations])
+        self.in_cycle = np.zeros((count, len(pallet_track.vision_stations)), bool)
+        self.inspect_end = np.zeros((count, len(pallet_track.vision_stations)), np.int64)
+
+    def check_status(self, time, column):
+        self.in_cycle[:, column] &= ~(self.inspect_end[:, column] < time)
+
+
+# station2_3 / station14 Feeder, columns ordered left/right feeder of each robot of each vision station
+class Feeders(object):
+    def __init__(self, count, rng):
+        stations = [station for station, names in pallet_track.vision_stations for _ in range(4)]
+        size = len(stations)
+        self.rng = rng
+        self.vision = np.repeat(np.arange(len(pallet_track.vision_stations)), 4)
+        self.durations = units([[0.0] * size,
+                                [station.inspect_duration for station in stations],
+                                [station.shuffle_duration for station in stations],
+                                [station.feed_in_duration for station in stations],
+                                [station.robot_prog_times.get('pick left feeder') for station in stations]])
+        self.pick_prob = np.array([station.pick_prob for station in stations])
+        self.total_qty_min = np.array([station.total_qty_min for station in stations])
+        self.feed_in_qty_min = np.array([station.feed_in_qty_min for station in stations])
+        self.feed_in_qty_max = np.array([station.feed_in_qty_max for station in stations])
+        self.activity = np.zeros((count, size), np.int8)
+        self.activity_end = np.zeros((count, size), np.int64)
+        self.ready_for_pick = np.zeros((count, size), bool)
+        self.ready_for_inspect = np.zeros((count, size), bool)
+        self.total_qty = np.zeros((count, size), np.int64)
+        self.pick_qty = np.zeros((count, size), np.int64)
+
+    def start(self, time, mask, activity):
+        np.copyto(self.activity, activity, where=mask)
+        np.copyto(self.activity_end, time + self.durations[activity], where=mask)
+
+    def shuffle(self, time, mask):
+        if mask.any():
+            self.start(time, mask, SHUFFLE)
+            rows, columns = np.nonzero(mask)
+            self.pick_qty[rows, columns] = self.rng.binomial(self.total_qty[rows, columns], self.pick_prob[columns])
+
+    def feed_in(self, time, mask):
+        if mask.any():
+            self.start(time, mask, FEED_IN)
+            rows, columns = np.nonzero(mask)
+            self.total_qty[rows, columns] += self.rng.integers(self.feed_in_qty_min[columns],
+                                                               self.feed_in_qty_max[columns] + 1)
+
+    def pick(self, time, mask):
+        self.start(time, mask, PICK)
+        self.ready_for_pick &= ~mask
+        self.pick_qty[mask] = 0
+        self.total_qty[mask] = 0
+
+    # Feeder.check_status of every feeder, interleaved with the vision controller checks in the same
+    # order as the station status_check calls
+    def check_status(self, time, vision):
+        # update 'in cycle' statuses
+        done = (self.activity != 0) & (self.activity_end < time)
+        if done.any():
+            activity = self.activity
+            self.ready_for_inspect |= done & ((activity == SHUFFLE) | (activity == PICK))
+            fed = done & (activity == FEED_IN)
+            np.copyto(self.activity, 0, where=done)
+            self.shuffle(time, fed)
+
+        # claim the vision controller in feeder order, it frees up after the first robot's feeders
+        idle = self.activity == 0
+        waiting = idle & ~self.ready_for_inspect
+        inspect = idle & self.ready_for_inspect
+        if inspect.any():
+            for column in range(inspect.shape[1]):
+                station = self.vision[column]
+                if column % 4 == 2:
+                    vision.check_status(time, station)
+                claim = inspect[:, column] & ~vision.in_cycle[:, station]
+                inspect[:, column] = claim
+                vision.in_cycle[:, station] |= claim
+                np.copyto(vision.inspect_end[:, station], time + vision.inspect_duration[station], where=claim)
+            self.start(time, inspect, INSPECT)
+            self.ready_for_inspect &= ~inspect
+        else:
+            for station in range(vision.in_cycle.shape[1]):
+                vision.check_status(time, station)
+
+        # check if tray has a pick-able part and shuffle/feed-in as necessary
+        pickable = self.pick_qty > 0
+        self.ready_for_pick |= waiting & pickable
+        waiting &= ~pickable
+        empty = waiting & (self.total_qty < self.total_qty_min)
+        self.feed_in(time, empty)
+        self.shuffle(time, waiting & ~empty)
+
+
+# robots of one kind, one column per robot; programs are numbered rows of prog_times
+class Robots(object):
+    def __init__(self, count, names, prog_times, bindings):
+        self.names = names
+        self.prog_times = units(prog_times)
+        self.current_prog = np.zeros((count, len(names)), np.int8)
+        self.prog_end = np.zeros((count, len(names)), np.int64)
+        self.in_cycle = np.zeros((count, len(names)), bool)
+        self.part_present = np.zeros((count, len(names)), bool)
+        self.part_inspected = np.zeros((count, len(names)), bool)
+        self.process_complete = np.zeros((count, len(names)), bool)
+        self.start_cycle_clock = np.zeros((count, len(names)), np.int64)
+        self.cycle_times = CycleTimes((count, len(names)))
+        self.position = np.array([bindings[name] - 1 for name in names])
+
+    def start_cycle(self, time, mask, prog, cycle_start):
+        np.copyto(self.current_prog, prog, where=mask)
+        np.copyto(self.prog_end, time + self.prog_times[prog], where=mask)
+        self.in_cycle |= mask
+        if cycle_start:
+            np.copyto(self.start_cycle_clock, time, where=mask)
+
+    # can the robot place at its pallet stop
+    def station_ready(self, stops):
+        return stops.occupied[:, self.position] & ~stops.process_complete[:, self.position]
+
+
+# station2_3 / station14 Robot
+class VisionRobots(Robots):
+    def __init__(self, count, bindings):
+        names = [name for station, pair in pallet_track.vision_stations for name in pair]
+        prog_times = [[station.robot_prog_times.get(prog) for station, pair in pallet_track.vision_stations for _ in pair]
+                      for prog in ('pick left feeder', 'pick right feeder', 'place at pallet')]
+        super(VisionRobots, self).__init__(count, names, prog_times, bindings)
+
+    def check_status(self, time):
+        done = self.in_cycle & (self.prog_end < time)
+        if done.any():
+            self.in_cycle &= ~done
+            placed = done & (self.current_prog == PLACE_AT_PALLET)
+            picked = done & ~placed
+            self.part_present |= picked
+            self.cycle_times.record(picked & (self.start_cycle_clock != 0), time - self.start_cycle_clock)
+            self.part_present &= ~placed
+            self.process_complete |= placed
+
+    # station2_3.decision_tree / station14.decision_tree
+    def decision_tree(self, time, feeders, stops):
+        free = ~self.in_cycle
+        empty_handed = free & ~self.part_present
+        pick_left = empty_handed & feeders.ready_for_pick[:, 0::2]
+        pick_right = empty_handed & ~pick_left & feeders.ready_for_pick[:, 1::2]
+        place = free & self.part_present & self.station_ready(stops)
+        if pick_left.any() or pick_right.any():
+            self.start_cycle(time, pick_left, PICK_LEFT, False)
+            self.start_cycle(time, pick_right, PICK_RIGHT, False)
+            picks = np.empty(feeders.ready_for_pick.shape, bool)
+            picks[:, 0::2] = pick_left
+            picks[:, 1::2] = pick_right
+            feeders.pick(time, picks)
+        if place.any():
+            self.start_cycle(time, place, PLACE_AT_PALLET, True)
+
+
+# station8_9 / station10_11 shuttle Feeder, one column per shuttle; parts are tracked per loading nest
+class Shuttles(object):
+    def __init__(self, count):
+        self.shuttle_duration = units([station.shuttle_duration + station.robot_prog_times.get('pick')
+                                       for station, names in pallet_track.shuttle_stations])
+        # False: at the first station of the pair, True: at the second
+        self.position = np.ones((count, len(pallet_track.shuttle_stations)), bool)
+        self.nest_parts = np.ones((count, 2 * len(pallet_track.shuttle_stations)), bool)
+        self.in_cycle = np.zeros((count, len(pallet_track.shuttle_stations)), bool)
+        self.shuttle_end = np.zeros((count, len(pallet_track.shuttle_stations)), np.int64)
+
+    # True where the handling robot of each nest has the shuttle in front of it
+    def at_nest(self):
+        at_nest = np.empty(self.nest_parts.shape, bool)
+        at_nest[:, 0::2] = ~self.position
+        at_nest[:, 1::2] = self.position
+        return at_nest
+
+    def check_status(self, time):
+        was_in_cycle = self.in_cycle.copy()
+        done = was_in_cycle & (self.shuttle_end < time)
+        if done.any():
+            self.in_cycle &= ~done
+            self.nest_parts[:, 0::2] |= done & ~self.position
+            self.nest_parts[:, 1::2] |= done & self.position
+            self.position ^= done
+        emptied = np.where(self.position, ~self.nest_parts[:, 1::2], ~self.nest_parts[:, 0::2])
+        start = ~was_in_cycle & emptied
+        if start.any():
+            self.in_cycle |= start
+            np.copyto(self.shuttle_end, time + self.shuttle_duration, where=start)
+
+
+# station8_9 / station10_11 handling Robot
+class HandlingRobots(Robots):
+    def __init__(self, count, bindings):
+        names = [name for station, pair in pallet_track.shuttle_stations for name in pair]
+        prog_times = [[station.robot_prog_times.get(prog) for station, pair in pallet_track.shuttle_stations for _ in pair]
+                      for prog in ('pick', 'inspect', 'place')]
+        super(HandlingRobots, self).__init__(count, names, prog_times, bindings)
+
+    def check_status(self, time):
+        done = self.in_cycle & (self.prog_end < time)
+        if done.any():
+            self.in_cycle &= ~done
+            prog = self.current_prog
+            self.part_present |= done & (prog == HANDLING_PICK)
+            inspected = done & (prog == HANDLING_INSPECT)
+            self.part_inspected |= inspected
+            self.cycle_times.record(inspected & (self.start_cycle_clock != 0), time - self.start_cycle_clock)
+            placed = done & (prog == HANDLING_PLACE)
+            self.part_present &= ~placed
+            self.part_inspected &= ~placed
+            self.process_complete |= placed
+
+    # station8_9.decision_tree / station10_11.decision_tree
+    def decision_tree(self, time, shuttles, stops):
+        free = ~self.in_cycle
+        pick = free & ~self.part_present & shuttles.at_nest() & shuttles.nest_parts
+        inspect = free & self.part_present & ~self.part_inspected
+        place = free & self.part_inspected & self.station_ready(stops)
+        if pick.any():
+            self.start_cycle(time, pick, HANDLING_PICK, False)
+            shuttles.nest_parts &= ~pick
+        if inspect.any():
+            self.start_cycle(time, inspect, HANDLING_INSPECT, False)
+        if place.any():
+            self.start_cycle(time, place, HANDLING_PLACE, True)
+
+
+# the robot-to-stop hand-over part of pallet_decision_tree at time, hand_overs as (stop column, robot columns)
+def hand_over(stops, hand_overs, time):
+    for pos, robot_columns in hand_overs:
+        complete = None
+        for robots, column in robot_columns:
+            done = robots.process_complete[:, column]
+            complete = done if complete is None else complete & done
+        if complete.any():
+            stops.process_complete[:, pos] |= complete
+            for robots, column in robot_columns:
+                robots.process_complete[:, column] &= ~complete
+            if pos == stops.takt_column:
+                stops.unload(complete, time)
+
+
+# run all replications in lock-step, returns per-replication (mean, max) pairs of every output
+def run_simulation(count=replications_count, generator_seed=seed):
+    line = pallet_track.load_line()
+    if not line.is_circular():
+        raise ValueError('the lock-step engine only runs single circular tracks, not diverts or lanes')
+    rng = np.random.default_rng(generator_seed)
+    stops = PalletStops(count, line)
+    vision = VisionControllers(count)
+    feeders = Feeders(count, rng)
+    vision_robots = VisionRobots(count, line.bindings)
+    shuttles = Shuttles(count)
+    handling_robots = HandlingRobots(count, line.bindings)
+    hand_overs = []
+    for pos in sorted(set(line.bindings.values())):
+        stops.timed[pos - 1] = False
+        hand_overs.append((pos - 1, [(robots, column)
+                                     for robots in (vision_robots, handling_robots)
+                                     for column in np.nonzero(robots.position == pos - 1)[0]]))
+
+    scheduler.reset(pallet_track.time_inc, False)
+    last_tick = scheduler.first_tick_after(scheduler.units(pallet_track.runtime * 3600)) - 1
+    for tick in range(last_tick + 1):
+        time = tick * scheduler.step
+        stops.check_status(time)
+        feeders.check_status(time, vision)
+        vision_robots.check_status(time)
+        handling_robots.check_status(time)
+        # status_check runs once per handling robot, so each shuttle is checked twice per step
+        shuttles.check_status(time)
+        shuttles.check_status(time)
+
+        hand_over(stops, hand_overs, time)
+        stops.decision_tree(time)
+        vision_robots.decision_tree(time, feeders, stops)
+        handling_robots.decision_tree(time, shuttles, stops)
+        stops.record_takt()
+
+    results = {}
+    for robots in (vision_robots, handling_robots):
+        for column, name in enumerate(robots.names):
+            results[name] = robots.cycle_times.samples(column)
+    results = {name: results[name] for name in line.bindings}
+    results['Overall'] = stops.takt.samples()
+    return results
+
+
+if __name__ == '__main__':
+    print('Simulating', replications_count, 'replications in lock-step...')
+    outputs = run_simulation()
+    replications.print_summary({name: replications.summarize(samples) for name, samples in outputs.items()})
+    print('')
+    print('Simulation Complete!')